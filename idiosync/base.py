@@ -3,17 +3,23 @@
 from __future__ import annotations
 
 from abc import abstractmethod
+import asyncio
+from binascii import unhexlify
 from collections import abc, UserString
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache
 import io
 import itertools
 import sys
-from typing import (Any, ClassVar, Generic, Iterable, Iterator, Optional,
-                    TextIO, Type, TypeVar, Union)
-from uuid import UUID
+from typing import (Any, AsyncIterator, ClassVar, ContextManager, Dict,
+                    Generic, Iterable, Iterator, Optional, TextIO, Tuple,
+                    Type, TypeVar, Union, cast)
+from uuid import UUID, SafeUUID
 import weakref
 
 
+T = TypeVar('T')
 T_Config = TypeVar('T_Config', bound='Config')
 T_Database = TypeVar('T_Database', bound='Database')
 T_Group = TypeVar('T_Group', bound='Group')
@@ -135,6 +141,14 @@ class WritableEntry(Entry[T_Database], Generic[T_Database]):
         """Look up closest matching user database entry"""
         return cls.find(entry.key)
 
+    @classmethod
+    def enable_syncids(cls, syncids: Iterable[UUID], enabled: bool = True,
+                       invert: bool = False) -> None:
+        """Enable (or disable) entries by synchronization identifier"""
+        for entry in cls.find_syncids(syncids, invert=invert):
+            if entry.enabled != enabled:
+                entry.enabled = enabled  # type: ignore[misc]
+
     @classmethod
     @abstractmethod
     def create(cls: Type[Self]) -> Self:
@@ -179,6 +193,9 @@ class State(abc.MutableMapping):
     KEY_COOKIE: ClassVar[str] = 'cookie'
     """Synchronization cookie state key"""
 
+    KEY_DEADLETTER: ClassVar[str] = 'deadletter:'
+    """Dead letter state key prefix"""
+
     def prepare(self) -> None:
         """Prepare for use as part of an idiosync user database"""
 
@@ -193,6 +210,17 @@ class State(abc.MutableMapping):
         """Synchronization cookie"""
         self[self.KEY_COOKIE] = str(value)
 
+    @property
+    def deadletters(self) -> Dict[SyncId, str]:
+        """Dead letters (for entries that could not be synchronized)"""
+        prefix = self.KEY_DEADLETTER
+        return {SyncId.from_str(k[len(prefix):]): self[k]
+                for k in list(self) if k.startswith(prefix)}
+
+    def deadletter_key(self, syncid: UUID) -> str:
+        """Dead letter state key"""
+        return '%s%s' % (self.KEY_DEADLETTER, syncid)
+
 
 ##############################################################################
 #
@@ -285,15 +313,76 @@ class SyncId(UUID):
 
     Bulk deletions may be carried out efficiently using only a list of
     synchronization identifiers.
+
+    Synchronization identifiers are converted between representations
+    on every synchronized entry, and so the alternative constructors
+    ``from_int()``, ``from_bytes()``, ``from_str()`` and
+    ``from_uuid()`` bypass the argument validation performed by the
+    generic UUID constructor.  Parsed string representations are
+    cached, since the same identifier will generally be seen several
+    times in quick succession (e.g. as both an entry attribute and a
+    synchronization state control value).
     """
 
+    CACHE_SIZE: ClassVar[int] = 4096
+    """Number of parsed string representations to cache"""
+
+    Self = TypeVar('Self', bound='SyncId')
+
     def __init__(self, *args: Any, uuid: UUID = None, **kwargs: Any) -> None:
         if uuid is not None:
-            kwargs['bytes'] = uuid.bytes
+            kwargs['int'] = uuid.int
             super().__init__(*args, **kwargs)
         else:
             super().__init__(*args, **kwargs)
 
+    @classmethod
+    def from_int(cls: Type[Self], value: int) -> Self:
+        """Construct synchronization identifier from 128-bit integer"""
+        self = cls.__new__(cls)
+        object.__setattr__(self, 'int', value)
+        object.__setattr__(self, 'is_safe', SafeUUID.unknown)
+        return self
+
+    @classmethod
+    def from_bytes(cls: Type[Self], value: bytes) -> Self:
+        """Construct synchronization identifier from raw 16-byte value"""
+        if len(value) != 16:
+            raise ValueError("Invalid raw UUID length %d" % len(value))
+        return cls.from_int(int.from_bytes(value, 'big'))
+
+    @classmethod
+    def from_uuid(cls: Type[Self], value: UUID) -> Self:
+        """Construct synchronization identifier from UUID"""
+        if isinstance(value, cls):
+            return value
+        return cls.from_int(value.int)
+
+    @classmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def from_str(cls: Type[Self], value: Union[str, bytes]) -> Self:
+        """Parse synchronization identifier
+
+        Both the canonical UUID representation and the FreeIPA
+        ``nsUniqueId`` representation are accepted, as either text or
+        ASCII-encoded bytes.
+        """
+        try:
+            if isinstance(value, str):
+                return cls.from_bytes(unhexlify(value.replace('-', '')))
+            return cls.from_bytes(unhexlify(value.replace(b'-', b'')))
+        except ValueError:
+            # Fall back to the generic UUID parser
+            if isinstance(value, bytes):
+                value = value.decode()
+            return cls.from_int(UUID(value).int)
+
+    @property
+    def nsuniqueid(self) -> str:
+        """FreeIPA ``nsUniqueId`` representation"""
+        value = '%032x' % self.int
+        return '-'.join((value[0:8], value[8:16], value[16:24], value[24:32]))
+
 
 @dataclass
 class SyncIds(abc.Iterable):
@@ -387,6 +476,27 @@ class Database(Generic[T_Config, T_User, T_Group]):
         self.Group.prepare()
 
 
+async def aiterate(iterable: Iterable[T]) -> AsyncIterator[T]:
+    """Iterate asynchronously over a blocking iterable
+
+    The blocking iterable is consumed within a background thread.
+    The thread is not waited for if iteration is abandoned (e.g. due
+    to cancellation), since it may be blocked indefinitely.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterable)
+    done = object()
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        while True:
+            item = await loop.run_in_executor(executor, next, iterator, done)
+            if item is done:
+                break
+            yield cast(T, item)
+    finally:
+        executor.shutdown(wait=False)
+
+
 WatchResult = Union[T_User, T_Group, SyncCookie, UnchangedSyncIds,
                     DeletedSyncIds, RefreshComplete, TraceEvent]
 
@@ -399,6 +509,18 @@ class WatchableDatabase(Database[T_Config, T_User, T_Group]):
               trace: bool = False) -> Iterator[WatchResult[T_User, T_Group]]:
         """Watch for database changes"""
 
+    async def awatch(self, cookie: str = None, persist: bool = True,
+                     trace: bool = False
+                     ) -> AsyncIterator[WatchResult[T_User, T_Group]]:
+        """Watch for database changes asynchronously
+
+        The default implementation runs the blocking :meth:`watch`
+        generator within a background thread.
+        """
+        events = self.watch(cookie=cookie, persist=persist, trace=trace)
+        async for event in aiterate(events):
+            yield event
+
     def trace(self, fh: Optional[TextIO] = None,
               cookiefh: Optional[TextIO] = None, **kwargs: Any) -> None:
         """Log database changes to a trace file"""
@@ -429,6 +551,14 @@ class WritableDatabase(Database[T_Config, T_WritableUser, T_WritableGroup],
     State: ClassVar[Type[T_State]]
     """State class for this database"""
 
+    ENTRY_ERRORS: ClassVar[Tuple[Type[Exception], ...]] = (ValueError,)
+    """Exceptions attributable to an individual entry
+
+    Only these exceptions are isolated (and recorded as dead letters)
+    during synchronization.  Any other exception, such as a
+    programming error, is propagated.
+    """
+
     state: T_State
     """Synchronization state"""
 
@@ -446,10 +576,38 @@ class WritableDatabase(Database[T_Config, T_WritableUser, T_WritableGroup],
             self.Group.find_syncids(syncids, invert=invert)
         )
 
+    def enable_syncids(self, syncids: Iterable[UUID], enabled: bool = True,
+                       invert: bool = False) -> None:
+        """Enable (or disable) entries by synchronization identifier"""
+        self.User.enable_syncids(syncids, enabled=enabled, invert=invert)
+        self.Group.enable_syncids(syncids, enabled=enabled, invert=invert)
+
     @abstractmethod
     def commit(self) -> None:
         """Commit database changes"""
 
+    @abstractmethod
+    def rollback(self) -> None:
+        """Roll back uncommitted database changes"""
+
+    @abstractmethod
+    def savepoint(self) -> ContextManager[None]:
+        """Create savepoint
+
+        Any exception raised within the savepoint context will roll
+        back all database changes made within the context, while
+        leaving earlier uncommitted changes intact.
+        """
+
+    def transient(self, exc: Exception) -> bool:
+        """Check if exception is a transient database error
+
+        A transient error (such as a lost connection or a lock
+        timeout) is not attributable to any particular entry.
+        """
+        # pylint: disable=unused-argument
+        return False
+
     def prepare(self) -> None:
         """Prepare for use as an idiosync user database"""
         super().prepare()
@@ -0,0 +1,124 @@
+"""Adaptive batch sizing"""
+
+from dataclasses import asdict, dataclass
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchMetrics:
+    """Current adaptive batch controller state"""
+
+    size: int
+    """Current batch size"""
+
+    interval: float
+    """Current commit interval (in seconds)"""
+
+    apply_latency: Optional[float] = None
+    """Smoothed batch apply latency (in seconds)"""
+
+    commit_latency: Optional[float] = None
+    """Smoothed batch commit latency (in seconds)"""
+
+    batches: int = 0
+    """Number of batches committed"""
+
+    entries: int = 0
+    """Number of entries committed"""
+
+
+@dataclass
+class BatchController:
+    """An adaptive batch size controller
+
+    The batch size (i.e. the number of entries applied within a single
+    destination database transaction) and the commit interval (i.e.
+    the maximum time between commits) are adjusted after each batch,
+    aiming to keep the observed commit latency close to a target.
+
+    A commit latency above the target (e.g. due to replication lag or
+    lock contention) halves the batch size and commit interval; a
+    commit latency comfortably below the target allows them to grow
+    gradually.  Both always remain within the configured bounds.
+
+    The current batch size, commit interval, and smoothed latencies
+    are available as :attr:`metrics`.
+    """
+
+    target: float = 0.5
+    """Target commit latency (in seconds)"""
+
+    min_size: int = 10
+    """Minimum batch size"""
+
+    max_size: int = 10000
+    """Maximum batch size"""
+
+    min_interval: float = 1
+    """Minimum commit interval (in seconds)"""
+
+    max_interval: float = 60
+    """Maximum commit interval (in seconds)"""
+
+    smoothing: float = 0.5
+    """Weight given to the most recent latency measurements"""
+
+    metrics: Optional[BatchMetrics] = None
+    """Current controller state (starting from the minimum bounds)"""
+
+    def __post_init__(self) -> None:
+        if not 0 < self.min_size <= self.max_size:
+            raise ValueError("Invalid batch size bounds")
+        if not 0 < self.min_interval <= self.max_interval:
+            raise ValueError("Invalid commit interval bounds")
+        if self.metrics is None:
+            self.metrics = BatchMetrics(self.min_size, self.min_interval)
+
+    @property
+    def size(self) -> int:
+        """Current batch size"""
+        return self.metrics.size
+
+    @property
+    def interval(self) -> float:
+        """Current commit interval (in seconds)"""
+        return self.metrics.interval
+
+    def smooth(self, previous: Optional[float], value: float) -> float:
+        """Calculate smoothed latency"""
+        if previous is None:
+            return value
+        return self.smoothing * value + (1 - self.smoothing) * previous
+
+    def due(self, count: int, started: float) -> bool:
+        """Check if a batch is due to be committed"""
+        return (count >= self.size or
+                time.monotonic() - started >= self.interval)
+
+    def record(self, count: int, apply_latency: float,
+               commit_latency: float) -> None:
+        """Record batch latencies and adjust batch size"""
+        metrics = self.metrics
+        metrics.batches += 1
+        metrics.entries += count
+        metrics.apply_latency = self.smooth(metrics.apply_latency,
+                                            apply_latency)
+        metrics.commit_latency = self.smooth(metrics.commit_latency,
+                                             commit_latency)
+        if metrics.commit_latency > self.target:
+            # Back off rapidly
+            metrics.size = max(metrics.size // 2, self.min_size)
+            metrics.interval = max(metrics.interval / 2, self.min_interval)
+        elif metrics.commit_latency < self.target / 2:
+            # Grow gradually whichever limit ended the batch
+            if count >= metrics.size:
+                metrics.size = min(metrics.size + max(metrics.size // 10, 1),
+                                   self.max_size)
+            else:
+                metrics.interval = min(metrics.interval * 1.1,
+                                       self.max_interval)
+        logger.debug("Batch metrics: %s", asdict(metrics))
@@ -2,10 +2,15 @@
 
 from abc import abstractmethod
 import argparse
+import asyncio
 from contextlib import nullcontext
 import logging
+import signal
 from typing import ClassVar, List, Type
-from .config import Config, DatabaseConfig, SynchronizerConfig
+from .config import (Config, ConfigError, DaemonConfig, DatabaseConfig,
+                     SynchronizerConfig)
+
+logger = logging.getLogger(__name__)
 
 
 class Command:
@@ -73,6 +78,20 @@ class ConfigCommand(Command):
         parser.add_argument('config', help="Configuration file")
         return parser
 
+    def reload(self):
+        """Reload configuration file
+
+        Settings that can safely be changed while running (such as
+        destination rate limits) are updated in place.
+        """
+        logger.info("Reloading %s", self.args.config)
+        try:
+            config = self.Config.load(self.args.config)
+        except (OSError, ConfigError) as e:
+            logger.error("Reload failed: %s", e)
+            return
+        self.config.update(config)
+
 
 class WatchCommand(Command):
     """An executable command for watching a database"""
@@ -120,13 +139,59 @@ class SynchronizeCommand(ConfigCommand, WatchCommand):
             '--no-delete', action='store_false', dest='delete', default=False,
             help="Disable deleted entries (default)",
         )
+        parser.add_argument(
+            '--shards', type=int, default=1,
+            help="Number of destination worker processes",
+        )
+        parser.add_argument(
+            '--coalesce', type=float, metavar='SECONDS',
+            help="Coalesce repeated modifications within latency budget",
+        )
+        parser.add_argument(
+            '--batch', type=float, metavar='SECONDS',
+            help="Commit refresh in batches aiming at target commit latency",
+        )
+        parser.add_argument(
+            '--batch-min', type=int, metavar='ENTRIES',
+            help="Minimum refresh batch size (with --batch)",
+        )
+        parser.add_argument(
+            '--batch-max', type=int, metavar='ENTRIES',
+            help="Maximum refresh batch size (with --batch)",
+        )
         return parser
 
+    @property
+    def batch(self):
+        """Adaptive batch controller settings (if any)"""
+        if not self.args.batch:
+            return None
+        settings = {
+            'target': self.args.batch,
+            'min_size': self.args.batch_min,
+            'max_size': self.args.batch_max,
+        }
+        return {k: v for k, v in settings.items() if v is not None}
+
     def execute(self):
-        """Execute command"""
-        self.config.synchronizer.sync(persist=self.args.persist,
-                                      strict=self.args.strict,
-                                      delete=self.args.delete)
+        """Execute command
+
+        Current synchronization metrics are logged upon receipt of
+        SIGUSR1.
+        """
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.reload())
+        if self.args.shards > 1:
+            syncer = self.config.sharded_synchronizer(self.args.shards)
+        else:
+            syncer = self.config.synchronizer
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: logger.info(
+                "Metrics: %s", syncer.metrics
+            ))
+        syncer.sync(persist=self.args.persist, strict=self.args.strict,
+                    delete=self.args.delete, coalesce=self.args.coalesce,
+                    batch=self.batch)
 
 
 class TraceCommand(ConfigCommand, WatchCommand):
@@ -150,3 +215,20 @@ class TraceCommand(ConfigCommand, WatchCommand):
                   nullcontext()) as cookiefh:
                 self.config.database.trace(fh=fh, cookiefh=cookiefh,
                                            persist=self.args.persist)
+
+
+class DaemonCommand(ConfigCommand):
+    """Run multiple user database synchronization jobs"""
+
+    Config = DaemonConfig
+
+    async def run(self):
+        """Run daemon"""
+        if hasattr(signal, 'SIGHUP'):
+            loop = asyncio.get_running_loop()
+            loop.add_signal_handler(signal.SIGHUP, self.reload)
+        await self.config.daemon.run()
+
+    def execute(self):
+        """Execute command"""
+        asyncio.run(self.run())
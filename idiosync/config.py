@@ -1,11 +1,18 @@
 """Configuration files"""
 
 from abc import abstractmethod
-from dataclasses import dataclass
-from typing import ClassVar, Mapping, Type
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import logging
+from typing import ClassVar, Dict, List, Mapping, Optional, Type
 import yaml
+from .daemon import Daemon
+from .limit import RateLimits
 from .plugins import plugins
-from .sync import Synchronizer
+from .shard import ShardedSynchronizer
+from .sync import Synchronizer, FanoutSynchronizer
+
+logger = logging.getLogger(__name__)
 
 
 class ConfigError(Exception):
@@ -23,6 +30,13 @@ class Config:
     def parse(cls, config):
         """Parse configuration"""
 
+    def update(self, other):
+        """Update configuration in place from reloaded configuration
+
+        Only settings that can safely be changed while running are
+        updated.
+        """
+
     @classmethod
     def load(cls, filename):
         """Load configuration from YAML file"""
@@ -37,10 +51,16 @@ class Config:
 
 @dataclass
 class DatabaseConfig(Config):
-    """A database configuration"""
+    """A database configuration
+
+    The optional ``limits`` section may specify the maximum number of
+    entry ``writes`` and ``commits`` per second, and the maximum
+    ``burst`` size, for use when the database is a destination.
+    """
 
     plugin: str
     params: Mapping
+    limits: RateLimits = field(default_factory=RateLimits)
 
     @classmethod
     def parse(cls, config):
@@ -49,7 +69,18 @@ class DatabaseConfig(Config):
             raise ConfigError("Missing declaration 'plugin'")
         params = dict(config)
         plugin = params.pop('plugin')
-        return cls(plugin, params)
+        limits = params.pop('limits', None) or {}
+        if not isinstance(limits, dict):
+            raise ConfigError("Invalid section 'limits'")
+        try:
+            limits = RateLimits(**limits)
+        except (TypeError, ValueError) as e:
+            raise ConfigError("In section 'limits': %s" % e) from e
+        return cls(plugin, params, limits)
+
+    def update(self, other):
+        """Update configuration in place from reloaded configuration"""
+        self.limits.update(other.limits)
 
     @property
     def database(self):
@@ -59,17 +90,28 @@ class DatabaseConfig(Config):
 
 DatabaseConfig_ = DatabaseConfig
 Synchronizer_ = Synchronizer
+FanoutSynchronizer_ = FanoutSynchronizer
+ShardedSynchronizer_ = ShardedSynchronizer
 
 
 @dataclass
 class SynchronizerConfig(Config):
-    """A database synchronizer configuration"""
+    """A database synchronizer configuration
+
+    The destination section may be either a single database
+    configuration, or a list of database configurations to be fed
+    from a single source database watch.
+    """
 
     src: DatabaseConfig_
-    dst: DatabaseConfig_
+    dsts: List[DatabaseConfig_]
 
     DatabaseConfig: ClassVar[Type[DatabaseConfig_]] = DatabaseConfig
     Synchronizer: ClassVar[Type[Synchronizer_]] = Synchronizer
+    FanoutSynchronizer: ClassVar[Type[FanoutSynchronizer_]] = \
+        FanoutSynchronizer
+    ShardedSynchronizer: ClassVar[Type[ShardedSynchronizer_]] = \
+        ShardedSynchronizer
 
     @classmethod
     def parse(cls, config):
@@ -78,13 +120,137 @@ class SynchronizerConfig(Config):
         for k in ('source', 'destination'):
             if k not in config:
                 raise ConfigError("Missing section '%s'" % k)
+            sections = config[k]
+            if k == 'destination' and isinstance(sections, list):
+                if not sections:
+                    raise ConfigError("Empty section '%s'" % k)
+            else:
+                sections = [sections]
             try:
-                db[k] = cls.DatabaseConfig.parse(config[k])
+                db[k] = [cls.DatabaseConfig.parse(x) for x in sections]
             except ConfigError as e:
                 raise ConfigError("In section '%s': %s'" % (k, *e.args)) from e
-        return cls(db['source'], db['destination'])
+        return cls(db['source'][0], db['destination'])
+
+    def update(self, other):
+        """Update configuration in place from reloaded configuration"""
+        if len(other.dsts) != len(self.dsts):
+            logger.warning("Cannot change number of destinations")
+            return
+        for dst, new in zip(self.dsts, other.dsts):
+            dst.update(new)
 
     @property
     def synchronizer(self):
-        """Configured synchronizer"""
-        return self.Synchronizer(self.src.database, self.dst.database)
+        """Configured synchronizer
+
+        The source database (which will typically need to connect and
+        bind to a remote server) is constructed in a background thread
+        while the destination databases are constructed, so that
+        neither has to wait for the other.  A single destination
+        database is also prepared at this point; multiple destination
+        databases are prepared concurrently when synchronization
+        starts.
+        """
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            src = executor.submit(lambda: self.src.database)
+            dsts = [x.database for x in self.dsts]
+            limits = [x.limits for x in self.dsts]
+            if len(dsts) > 1:
+                return self.FanoutSynchronizer(src.result(), dsts,
+                                               limits=limits)
+            dst, = dsts
+            dst.prepare()
+            return self.Synchronizer(src.result(), dst, prepared=True,
+                                     limits=limits[0])
+
+    def sharded_synchronizer(self, shards):
+        """Configured synchronizer with sharded destination writes"""
+        if len(self.dsts) > 1:
+            raise ConfigError("Sharding requires a single destination")
+        dst, = self.dsts
+        return self.ShardedSynchronizer(self.src.database, dst, shards=shards)
+
+
+SynchronizerConfig_ = SynchronizerConfig
+
+
+@dataclass
+class JobConfig(SynchronizerConfig_):
+    """A daemon synchronization job configuration
+
+    A job runs in refresh and persist mode unless a refresh interval
+    (in seconds) is specified, in which case it runs in refresh only
+    mode at the specified interval.
+    """
+
+    persist: bool = True
+    interval: Optional[float] = None
+    strict: bool = False
+    delete: bool = False
+
+    @classmethod
+    def parse(cls, config):
+        """Parse configuration"""
+        job = super().parse(config)
+        for k in ('strict', 'delete'):
+            if k in config:
+                if not isinstance(config[k], bool):
+                    raise ConfigError("Invalid declaration '%s'" % k)
+                setattr(job, k, config[k])
+        if 'interval' in config:
+            interval = config['interval']
+            if (isinstance(interval, bool) or
+                    not isinstance(interval, (int, float)) or interval <= 0):
+                raise ConfigError("Invalid declaration 'interval'")
+            job.interval = interval
+            job.persist = False
+        return job
+
+
+JobConfig_ = JobConfig
+Daemon_ = Daemon
+
+
+@dataclass
+class DaemonConfig(Config):
+    """A synchronization daemon configuration"""
+
+    jobs: Dict[str, JobConfig_]
+    concurrency: int = 1
+    retry: float = 60
+
+    JobConfig: ClassVar[Type[JobConfig_]] = JobConfig
+    Daemon: ClassVar[Type[Daemon_]] = Daemon
+
+    @classmethod
+    def parse(cls, config):
+        """Parse configuration"""
+        if not config.get('jobs'):
+            raise ConfigError("Missing section 'jobs'")
+        jobs = {}
+        for name, job in config['jobs'].items():
+            try:
+                jobs[name] = cls.JobConfig.parse(job)
+            except ConfigError as e:
+                raise ConfigError("In job '%s': %s" % (name, *e.args)) from e
+        kwargs = {}
+        for k in ('concurrency', 'retry'):
+            if k in config:
+                if (isinstance(config[k], bool) or
+                        not isinstance(config[k], (int, float)) or
+                        config[k] <= 0):
+                    raise ConfigError("Invalid declaration '%s'" % k)
+                kwargs[k] = config[k]
+        return cls(jobs, **kwargs)
+
+    def update(self, other):
+        """Update configuration in place from reloaded configuration"""
+        for name, job in self.jobs.items():
+            if name in other.jobs:
+                job.update(other.jobs[name])
+
+    @property
+    def daemon(self):
+        """Configured daemon"""
+        return self.Daemon(self)
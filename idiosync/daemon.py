@@ -0,0 +1,178 @@
+"""Synchronization daemon"""
+
+import asyncio
+from dataclasses import dataclass, field
+import logging
+from typing import Any, ClassVar, Dict, List, Optional, Type
+from .base import Database
+from .sync import FanoutSynchronizer
+
+logger = logging.getLogger(__name__)
+
+FanoutSynchronizer_ = FanoutSynchronizer
+
+
+@dataclass
+class DaemonJob:
+    """A daemon synchronization job
+
+    A daemon job comprises one or more configured synchronization jobs
+    that share an identical source database configuration and an
+    identical synchronization mode.  All such jobs are served by a
+    single source database connection and watch.  The ``strict`` and
+    ``delete`` options may differ between configured jobs, and are
+    applied to each destination database individually.
+    """
+
+    names: List[str]
+    """Configured job names"""
+
+    src: Any
+    """Source database configuration"""
+
+    dsts: List[Any]
+    """Destination database configurations"""
+
+    options: List[Dict[str, bool]] = field(default_factory=list)
+    """Per-destination synchronization options"""
+
+    persist: bool = True
+    """Refresh and persist (rather than refresh only)"""
+
+    interval: Optional[float] = None
+    """Refresh interval (for refresh only jobs)"""
+
+    databases: Optional[List[Database]] = field(default=None, init=False,
+                                                repr=False)
+    """Destination databases (constructed on first use)"""
+
+    FanoutSynchronizer: ClassVar[Type[FanoutSynchronizer_]] = \
+        FanoutSynchronizer
+
+    def __str__(self):
+        return ','.join(self.names)
+
+    def accepts(self, job):
+        """Check if configured job can share this daemon job"""
+        return (job.src == self.src and job.persist == self.persist and
+                job.interval == self.interval)
+
+    def add(self, name, job):
+        """Add configured job"""
+        self.names.append(name)
+        self.dsts.extend(job.dsts)
+        self.options.extend({'strict': job.strict, 'delete': job.delete}
+                            for _ in job.dsts)
+
+    async def run(self):
+        """Run synchronization
+
+        The source database is constructed afresh for each run (since
+        a previous connection may have failed or timed out), while the
+        destination databases are retained between runs.  Any
+        uncommitted changes in the destination databases are rolled
+        back after a failed run, so that the next run starts with a
+        clean transaction.
+        """
+        loop = asyncio.get_running_loop()
+        src = await loop.run_in_executor(None, lambda: self.src.database)
+        if self.databases is None:
+            self.databases = [x.database for x in self.dsts]
+        syncer = self.FanoutSynchronizer(src, self.databases,
+                                         limits=[x.limits for x in self.dsts],
+                                         options=self.options)
+        try:
+            await syncer.async_sync(persist=self.persist)
+        except Exception:
+            self.rollback()
+            raise
+        finally:
+            syncer.close()
+
+    def rollback(self):
+        """Roll back destination databases
+
+        A destination database that cannot be rolled back (e.g. due to
+        a lost connection) is discarded, to be reconstructed on the
+        next run.
+        """
+        for db in self.databases or ():
+            try:
+                db.rollback()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("%s rollback failed", self)
+                self.databases = None
+                break
+
+
+DaemonJob_ = DaemonJob
+
+
+@dataclass
+class Daemon:
+    """A synchronization daemon
+
+    Runs many synchronization jobs within a single process, using a
+    shared asyncio scheduler.  Jobs in refresh and persist mode run
+    continuously, and are restarted after a delay upon failure.  Jobs
+    in refresh only mode run at fixed intervals, with no job ever
+    overlapping with itself and with at most a fixed number of
+    refreshes running concurrently.
+
+    Concurrency is limited globally (via the ``concurrency`` setting)
+    rather than per job, since each job is already limited to a
+    single run at a time.  The load placed on each individual
+    destination database may be limited via its ``limits`` section.
+    """
+
+    config: Any
+    """Daemon configuration"""
+
+    jobs: List[DaemonJob_] = field(init=False)
+    """Daemon jobs"""
+
+    DaemonJob: ClassVar[Type[DaemonJob_]] = DaemonJob
+
+    def __post_init__(self) -> None:
+        self.jobs = []
+        for name, config in self.config.jobs.items():
+            job = next((x for x in self.jobs if x.accepts(config)), None)
+            if job is None:
+                job = self.DaemonJob([], config.src, [],
+                                     persist=config.persist,
+                                     interval=config.interval)
+                self.jobs.append(job)
+            job.add(name, config)
+
+    async def persist(self, job):
+        """Run refresh and persist job"""
+        while True:
+            logger.info("starting %s", job)
+            try:
+                await job.run()
+                logger.error("%s stopped unexpectedly", job)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("%s failed", job)
+            await asyncio.sleep(self.config.retry)
+
+    async def periodic(self, job, semaphore):
+        """Run refresh only job"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            async with semaphore:
+                logger.info("refreshing %s", job)
+                try:
+                    await job.run()
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("%s failed", job)
+            elapsed = loop.time() - started
+            await asyncio.sleep(max(job.interval - elapsed, 0))
+
+    async def run(self):
+        """Run daemon"""
+        semaphore = asyncio.Semaphore(self.config.concurrency)
+        await asyncio.gather(*(
+            self.persist(job) if job.persist else
+            self.periodic(job, semaphore) for job in self.jobs
+        ))
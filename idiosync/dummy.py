@@ -2,10 +2,12 @@
 
 from collections import UserDict
 from dataclasses import dataclass
-import uuid
+from functools import lru_cache
+from typing import ClassVar
+import uuid as uuidlib
 from .base import Database, WritableGroup, State
 
-NAMESPACE_DUMMY = uuid.UUID('c5dd5cb8-b889-431e-8426-81297a053894')
+NAMESPACE_DUMMY = uuidlib.UUID('c5dd5cb8-b889-431e-8426-81297a053894')
 
 
 @dataclass  # type: ignore[misc]
@@ -19,6 +21,9 @@ class DummyGroup(WritableGroup):
 
     key: str = None
 
+    CACHE_SIZE: ClassVar[int] = 4096
+    """Maximum number of cached permanent identifiers"""
+
     @property
     def uuid(self):
         """Permanent identifier for this entry
@@ -28,7 +33,13 @@ class DummyGroup(WritableGroup):
         the caveat that a rename will be treated as a deletion and an
         unrelated creation.
         """
-        return uuid.uuid5(NAMESPACE_DUMMY, self.key)
+        return self.derive_uuid(self.key)
+
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def derive_uuid(key):
+        """Derive permanent identifier from group key"""
+        return uuidlib.uuid5(NAMESPACE_DUMMY, key)
 
     @property
     def syncid(self):
@@ -42,38 +42,59 @@ class IpaDatabase(Rfc2307Database):
     User = IpaUser
     Group = IpaGroup
 
+    @staticmethod
+    def _watch_fixup(event, incremental, persist):
+        """Work around 389-ds-base syncrepl bugs"""
+        if isinstance(event, RefreshComplete):
+            if incremental and not persist:
+                # In refreshOnly mode with a request cookie,
+                # 389-ds-base will send any modified or deleted
+                # entries followed by a syncDoneControl with
+                # refreshDeletes omitted (thereby erroneously
+                # indicating that all unmentioned entries should
+                # be deleted).
+                #
+                # Work around this incorrect behaviour by assuming
+                # that an explicit deletion list will always be
+                # sent.
+                #
+                logger.warning("Assuming refreshDeletes=True intended")
+                event.autodelete = False
+            elif persist and not incremental:
+                # In refreshAndPersist mode with no request
+                # cookie, 389-ds-base will send all existing
+                # entries followed by a syncInfoMessage of
+                # refreshDelete (thereby erroneously indicating
+                # that any unmentioned entries should not be
+                # deleted).
+                #
+                # Work around this incorrect behaviour by assuming
+                # that an initial content request always includes
+                # the full set of entries.
+                #
+                logger.warning("Assuming refreshPresent intended")
+                event.autodelete = True
+
     def watch(self, cookie=None, persist=True, trace=False):
         """Watch for database changes"""
         incremental = cookie is not None
         for event in super().watch(cookie=cookie, persist=persist,
                                    trace=trace):
+            self._watch_fixup(event, incremental, persist)
+            if isinstance(event, RefreshComplete):
+                # Any subsequent refresh (e.g. following a partitioned
+                # initial refresh) will resume from a cookie
+                incremental = True
+            yield event
+
+    async def awatch(self, cookie=None, persist=True, trace=False):
+        """Watch for database changes asynchronously"""
+        incremental = cookie is not None
+        async for event in super().awatch(cookie=cookie, persist=persist,
+                                          trace=trace):
+            self._watch_fixup(event, incremental, persist)
             if isinstance(event, RefreshComplete):
-                if incremental and not persist:
-                    # In refreshOnly mode with a request cookie,
-                    # 389-ds-base will send any modified or deleted
-                    # entries followed by a syncDoneControl with
-                    # refreshDeletes omitted (thereby erroneously
-                    # indicating that all unmentioned entries should
-                    # be deleted).
-                    #
-                    # Work around this incorrect behaviour by assuming
-                    # that an explicit deletion list will always be
-                    # sent.
-                    #
-                    logger.warning("Assuming refreshDeletes=True intended")
-                    event.autodelete = False
-                elif persist and not incremental:
-                    # In refreshAndPersist mode with no request
-                    # cookie, 389-ds-base will send all existing
-                    # entries followed by a syncInfoMessage of
-                    # refreshDelete (thereby erroneously indicating
-                    # that any unmentioned entries should not be
-                    # deleted).
-                    #
-                    # Work around this incorrect behaviour by assuming
-                    # that an initial content request always includes
-                    # the full set of entries.
-                    #
-                    logger.warning("Assuming refreshPresent intended")
-                    event.autodelete = True
+                # Any subsequent refresh (e.g. following a partitioned
+                # initial refresh) will resume from a cookie
+                incremental = True
             yield event
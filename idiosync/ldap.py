@@ -1,20 +1,26 @@
 """LDAP user database"""
 
 from abc import abstractmethod
+import asyncio
 from base64 import b64encode, b64decode
 from collections import defaultdict
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 import logging
+import queue
 import re
-from typing import Any, Callable, ClassVar, List, Mapping, Pattern, Tuple
-import uuid
+import threading
+from typing import (Any, Callable, ClassVar, Dict, List, Mapping, Optional,
+                    Pattern, Tuple)
 import ldap
+import ldap.dn
+from ldap.controls import SimplePagedResultsControl
 from ldap.syncrepl import (SyncRequestControl, SyncStateControl,
                            SyncDoneControl)
 import ldif
 from .base import (Attribute, Entry, User, Group, Config, WatchableDatabase,
                    SyncId, UnchangedSyncIds, DeletedSyncIds, RefreshComplete,
-                   SyncCookie, TraceEvent)
+                   SyncCookie, TraceEvent, aiterate)
 from .syncrepl import SyncInfoMessage
 
 logger = logging.getLogger(__name__)
@@ -247,7 +253,7 @@ class LdapUuidAttribute(LdapAttribute):
     @staticmethod
     def parse(value):
         """Parse attribute value"""
-        return uuid.UUID(value.decode())
+        return SyncId.from_str(value)
 
 
 class LdapEntryUuidAttribute(LdapUuidAttribute):
@@ -263,18 +269,55 @@ class LdapEntryUuidAttribute(LdapUuidAttribute):
 # LDAP entries
 
 
+LDAP_SCOPES = {
+    'base': ldap.SCOPE_BASE,
+    'one': ldap.SCOPE_ONELEVEL,
+    'sub': ldap.SCOPE_SUBTREE,
+}
+
+
+def ldap_rdns(dn):
+    """Split distinguished name into normalised relative components"""
+    return [x.lower() for x in ldap.dn.explode_dn(dn)] if dn else []
+
+
 @dataclass
 class LdapModel:
-    """An LDAP model"""
+    """An LDAP model
+
+    The search base, scope, and an additional search filter fragment
+    may be configured for each model, to restrict the entries that
+    will be retrieved from the directory server.
+    """
 
     objectClass: str
     key: str
     member: Callable[[Any], str]
+    base: Optional[str] = None
+    scope: str = 'sub'
+    filter: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if self.scope not in LDAP_SCOPES:
+            raise ValueError("Invalid search scope '%s'" % self.scope)
 
     @property
     def all(self):
         """Search filter for all entries"""
-        return '(objectClass=%s)' % self.objectClass
+        search = '(objectClass=%s)' % self.objectClass
+        if self.filter:
+            search = '(&%s%s)' % (search, self.filter)
+        return search
+
+    def within(self, dn):
+        """Check if distinguished name lies within search base and scope"""
+        rdns = ldap_rdns(dn)
+        base = ldap_rdns(self.base)
+        depth = len(rdns) - len(base)
+        if depth < 0 or rdns[depth:] != base:
+            return False
+        return (self.scope == 'sub' or
+                depth == (1 if self.scope == 'one' else 0))
 
     def single(self, key):
         """Search filter for a single entry"""
@@ -322,7 +365,7 @@ class LdapEntry(Entry):
     @classmethod
     def find(cls, key):
         """Look up user database entry"""
-        res = cls.db.search(cls.model.single(key))
+        res = cls.db.search(cls.model.single(key), cls.model)
         try:
             [(dn, attrs)] = res
         except ValueError:
@@ -351,8 +394,9 @@ class LdapUser(LdapEntry, User):
     @property
     def groups(self):
         """Groups of which this user is a member"""
+        model = self.db.Group.model
         return (self.db.Group(dn, attrs) for dn, attrs in
-                self.db.search(self.db.Group.model.membership(self)))
+                self.db.search(model.membership(self), model))
 
 
 class LdapGroup(LdapEntry, Group):
@@ -368,8 +412,9 @@ class LdapGroup(LdapEntry, Group):
     @property
     def users(self):
         """Users who are members of this group"""
+        model = self.db.User.model
         return (self.db.User(dn, attrs) for dn, attrs in
-                self.db.search(self.db.User.model.membership(self)))
+                self.db.search(model.membership(self), model))
 
 
 ##############################################################################
@@ -378,8 +423,14 @@ class LdapGroup(LdapEntry, Group):
 
 
 @dataclass
-class LdapConfig(Config):
-    """LDAP user database configuration"""
+class LdapConfig(Config):  # pylint: disable=too-many-instance-attributes
+    """LDAP user database configuration
+
+    The ``users`` and ``groups`` sections may each specify a search
+    ``base``, a search ``scope`` (``base``, ``one``, or ``sub``), and
+    an additional search ``filter`` fragment (e.g. a ``memberOf``
+    restriction).
+    """
 
     uri: str = None
     domain: str = ''
@@ -388,10 +439,18 @@ class LdapConfig(Config):
     username: str = None
     password: str = None
     options: Mapping = field(default_factory=dict)
+    partitions: List[Mapping[str, str]] = field(default_factory=list)
+    users: Mapping[str, str] = field(default_factory=dict)
+    groups: Mapping[str, str] = field(default_factory=dict)
 
     def __post_init__(self) -> None:
         if self.base is None:
             self.base = ','.join('dc=%s' % x for x in self.domain.split('.'))
+        for section in (self.users, self.groups):
+            unknown = set(section) - {'base', 'scope', 'filter'}
+            if unknown:
+                raise ValueError("Unexpected arguments: %s" %
+                                 ", ".join(sorted(unknown)))
 
 
 class LdapDatabase(WatchableDatabase):
@@ -403,16 +462,39 @@ class LdapDatabase(WatchableDatabase):
 
     config: LdapConfig
 
+    PAGE_SIZE: ClassVar[int] = 1000
+    """Number of entries retrieved per page during a bootstrap refresh"""
+
+    BOOTSTRAP_QUEUE: ClassVar[int] = 10000
+    """Maximum number of retrieved entries awaiting processing"""
+
+    BOOTSTRAP_POLL: ClassVar[float] = 1
+    """Interval (in seconds) at which blocked searches check for abort"""
+
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
-        self.ldap = ldap.initialize(self.config.uri, **self.config.options)
-        self.bind()
+        # Apply configured search base, scope, and filter for each model
+        users: Dict[str, Any] = {'base': self.config.base,
+                                 **self.config.users}
+        groups: Dict[str, Any] = {'base': self.config.base,
+                                  **self.config.groups}
+        self.User.model = replace(self.User.model, **users)
+        self.Group.model = replace(self.Group.model, **groups)
+        self.ldap = self.connect()
 
     def __repr__(self):
         return "%s(%r)" % (self.__class__.__name__, self.config.base)
 
-    def bind(self):
+    def connect(self):
+        """Open new (bound) connection to LDAP database"""
+        conn = ldap.initialize(self.config.uri, **self.config.options)
+        self.bind(conn)
+        return conn
+
+    def bind(self, conn=None):
         """Bind to LDAP database"""
+        if conn is None:
+            conn = self.ldap
         if self.config.sasl_mech:
             # Perform SASL bind
             cb = {
@@ -420,56 +502,178 @@ class LdapDatabase(WatchableDatabase):
                 ldap.sasl.CB_PASS: self.config.password
             }
             sasl = ldap.sasl.sasl(cb, self.config.sasl_mech)
-            self.ldap.sasl_interactive_bind_s('', sasl)
+            conn.sasl_interactive_bind_s('', sasl)
         else:
             # Perform simple (or anonymous) bind
-            self.ldap.simple_bind_s(self.config.username or '',
-                                    self.config.password or '')
-        logger.debug("Authenticated as %s", self.ldap.whoami_s())
-
-    def search(self, search):
-        """Search LDAP database"""
-        logger.debug("Searching for %s", search)
-        return self.ldap.search_s(self.config.base, ldap.SCOPE_SUBTREE,
-                                  search, ['*', '+'])
+            conn.simple_bind_s(self.config.username or '',
+                               self.config.password or '')
+        logger.debug("Authenticated as %s", conn.whoami_s())
+
+    def search(self, search, model=None):
+        """Search LDAP database
+
+        The search base and scope are taken from the model, if
+        specified.
+        """
+        base = self.config.base if model is None else model.base
+        scope = 'sub' if model is None else model.scope
+        logger.debug("Searching %s for %s", base, search)
+        return self.ldap.search_s(base, LDAP_SCOPES[scope], search,
+                                  ['*', '+'])
 
     @property
     def users(self):
         """All users"""
+        model = self.User.model
         return (self.User(dn, attrs) for dn, attrs in
-                self.search(self.User.model.all))
+                self.search(model.all, model))
 
     @property
     def groups(self):
         """All groups"""
+        model = self.Group.model
         return (self.Group(dn, attrs) for dn, attrs in
-                self.search(self.Group.model.all))
+                self.search(model.all, model))
 
-    def _watch_search(self, cookie=None, persist=True):
-        """Get watch search results"""
+    @property
+    def _watch_base(self):
+        """Watch search base and scope
+
+        A single watch search must cover both users and groups.  If
+        the two models have differing bases or scopes, the watch
+        search covers the whole subtree below their closest common
+        ancestor, and any entries outside the relevant model's own
+        base and scope are discarded as they are received.
+        """
+        users = self.User.model
+        groups = self.Group.model
+        if self._watch_exact:
+            return users.base, users.scope
+        common: List[str] = []
+        for user_rdn, group_rdn in zip(
+                reversed(ldap.dn.explode_dn(users.base)),
+                reversed(ldap.dn.explode_dn(groups.base))
+        ):
+            if user_rdn.lower() != group_rdn.lower():
+                break
+            common.insert(0, user_rdn)
+        return ','.join(common), 'sub'
+
+    @property
+    def _watch_exact(self):
+        """Watch search exactly matches both models' bases and scopes"""
+        users = self.User.model
+        groups = self.Group.model
+        return (users.base.lower() == groups.base.lower() and
+                users.scope == groups.scope)
+
+    @property
+    def _watch_filter(self):
+        """Watch search filter"""
+        return '(|%s%s)' % (self.User.model.all, self.Group.model.all)
+
+    def _watch_within(self, dn, entry=None):
+        """Check if watched entry lies within the relevant base and scope
+
+        Entries that are identified only by UUID (and so are of
+        unknown type) are checked against both models.
+        """
+        if self._watch_exact:
+            return True
+        if entry is not None:
+            within = entry.model.within(dn)
+        else:
+            within = (self.User.model.within(dn) or
+                      self.Group.model.within(dn))
+        if not within:
+            logger.debug("Out of scope entry %s", dn)
+        return within
+
+    def _watch_search_ext(self, cookie=None, persist=True, attrs=None,
+                          conn=None):
+        """Start watch search"""
+        if conn is None:
+            conn = self.ldap
         mode = 'refreshAndPersist' if persist else 'refreshOnly'
         cookie = str(cookie) if cookie is not None else None
         syncreq = SyncRequestControl(cookie=cookie, mode=mode)
-        search = '(|%s%s)' % (self.User.model.all, self.Group.model.all)
-        logger.debug("Searching in %s mode for %s", mode, search)
-        msgid = self.ldap.search_ext(self.config.base, ldap.SCOPE_SUBTREE,
-                                     search, ['*', '+'], serverctrls=[syncreq])
+        base, scope = self._watch_base
+        search = self._watch_filter
+        if attrs is None:
+            attrs = ['*', '+']
+        logger.debug("Searching %s in %s mode for %s", base, mode, search)
+        return conn.search_ext(base, LDAP_SCOPES[scope], search, attrs,
+                               serverctrls=[syncreq])
+
+    def _watch_result4(self, msgid, timeout=-1, conn=None):
+        """Get next watch search result (if available within timeout)"""
+        if conn is None:
+            conn = self.ldap
+        return conn.result4(
+            msgid, all=0, timeout=timeout, add_ctrls=1, add_intermediates=1,
+            resp_ctrl_classes=RESPONSE_CONTROLS,
+        )
+
+    def _watch_search(self, cookie=None, persist=True):
+        """Get watch search results"""
+        msgid = self._watch_search_ext(cookie=cookie, persist=persist)
         while True:
-            yield LdapResult(*self.ldap.result4(
-                msgid, all=0, add_ctrls=1, add_intermediates=1,
-                resp_ctrl_classes=RESPONSE_CONTROLS,
-            ))
+            yield LdapResult(*self._watch_result4(msgid))
 
-    def _watch_res_search_entry(self, dn, attrs, sync):
-        """Process watch search entry"""
+    async def _awatch_search(self, cookie=None, persist=True):
+        """Get watch search results asynchronously
+
+        Results are retrieved without blocking, waiting for the LDAP
+        connection's file descriptor to become readable whenever no
+        complete result is yet available.
+
+        Each asynchronous watch uses a separate connection, since
+        concurrent watches cannot share a file descriptor reader (or
+        read results from the same connection).
+        """
+        loop = asyncio.get_running_loop()
+        conn = await loop.run_in_executor(None, self.connect)
+        try:
+            msgid = self._watch_search_ext(cookie=cookie, persist=persist,
+                                           conn=conn)
+            fd = conn.fileno()
+            while True:
+                res = self._watch_result4(msgid, timeout=0, conn=conn)
+                if res[0] is not None:
+                    yield LdapResult(*res)
+                    continue
+                readable = loop.create_future()
+                loop.add_reader(fd, lambda: (readable.done() or
+                                             readable.set_result(None)))
+                try:
+                    await readable
+                finally:
+                    loop.remove_reader(fd)
+        finally:
+            conn.unbind_s()
+
+    def _entry(self, dn, attrs):
+        """Construct user or group entry"""
         user_objectClass = self.User.model.objectClass.lower()
         group_objectClass = self.Group.model.objectClass.lower()
-        syncid = SyncId(sync.entryUUID)
+        attrs = LdapAttributeDict(attrs)
+        for objectClass in attrs.get('objectclass', ()):
+            objectClass = objectClass.decode().lower()
+            if objectClass == user_objectClass:
+                return self.User(dn, attrs)
+            if objectClass == group_objectClass:
+                return self.Group(dn, attrs)
+        raise LdapUnrecognisedEntryError(dn)
+
+    def _watch_res_search_entry(self, dn, attrs, sync):
+        """Process watch search entry"""
+        syncid = SyncId.from_str(sync.entryUUID)
         if sync.state == 'present':
 
             # Unchanged entry (identified only by UUID)
             logger.debug("Present entry %s", syncid)
-            yield UnchangedSyncIds([syncid])
+            if not dn or self._watch_within(dn):
+                yield UnchangedSyncIds([syncid])
 
         elif sync.state == 'delete':
 
@@ -480,24 +684,16 @@ class LdapDatabase(WatchableDatabase):
         else:
 
             # Modified or newly created entry (with UUID and DN)
-            constructor = None
-            attrs = LdapAttributeDict(attrs)
-            for objectClass in attrs['objectclass']:
-                objectClass = objectClass.decode().lower()
-                if objectClass == user_objectClass:
-                    constructor = self.User
-                    break
-                if objectClass == group_objectClass:
-                    constructor = self.Group
-                    break
-            if constructor is None:
-                raise LdapUnrecognisedEntryError(dn)
-            entry = constructor(dn, attrs)
+            entry = self._entry(dn, attrs)
             if entry.uuid is None:
                 entry.uuid = syncid
             elif entry.uuid != syncid:
                 raise LdapSyncIdMismatchError(syncid, entry.uuid, dn)
-            yield entry
+            if self._watch_within(dn, entry):
+                yield entry
+            else:
+                # Treat entries outside the model's scope as deleted
+                yield DeletedSyncIds([syncid])
 
         # Update cookie if applicable
         if sync.cookie is not None:
@@ -541,7 +737,7 @@ class LdapDatabase(WatchableDatabase):
                          ("Delete" if delete else "Present"), len(uuids),
                          ", ".join(str(x) for x in uuids))
             cls = (DeletedSyncIds if delete else UnchangedSyncIds)
-            syncids = cls([SyncId(x) for x in uuids])
+            syncids = cls(uuids)
             yield syncids
 
         else:
@@ -568,32 +764,207 @@ class LdapDatabase(WatchableDatabase):
         if cookie is not None:
             yield SyncCookie(cookie)
 
-    def watch(self, cookie=None, persist=True, trace=False):
-        """Watch for database changes"""
-        for res in self._watch_search(cookie=cookie, persist=persist):
-            if trace:
-                yield res
-            rtype = res.type
-            if rtype == ldap.RES_SEARCH_ENTRY:
-                for dn, attrs, ctrls in res.data:
-                    sync = next((ctrl for ctrl in ctrls if
-                                 isinstance(ctrl, SyncStateControl)), None)
-                    if sync is None:
-                        raise LdapProtocolError("Missing syncStateControl")
-                    yield from self._watch_res_search_entry(dn, attrs, sync)
-            elif rtype == ldap.RES_INTERMEDIATE:
-                sync = next((SyncInfoMessage(msg)
-                             for rname, msg, ctrls in res.data
-                             if rname == SyncInfoMessage.responseName), None)
+    def _watch_result(self, res):
+        """Process watch search result message"""
+        rtype = res.type
+        if rtype == ldap.RES_SEARCH_ENTRY:
+            for dn, attrs, ctrls in res.data:
+                sync = next((ctrl for ctrl in ctrls if
+                             isinstance(ctrl, SyncStateControl)), None)
                 if sync is None:
-                    raise LdapProtocolError("Missing syncInfoMessage")
-                yield from self._watch_res_intermediate(sync)
-            elif rtype == ldap.RES_SEARCH_RESULT:
+                    raise LdapProtocolError("Missing syncStateControl")
+                yield from self._watch_res_search_entry(dn, attrs, sync)
+        elif rtype == ldap.RES_INTERMEDIATE:
+            sync = next((SyncInfoMessage(msg)
+                         for rname, msg, ctrls in res.data
+                         if rname == SyncInfoMessage.responseName), None)
+            if sync is None:
+                raise LdapProtocolError("Missing syncInfoMessage")
+            yield from self._watch_res_intermediate(sync)
+        elif rtype == ldap.RES_SEARCH_RESULT:
+            sync = next((ctrl for ctrl in res.ctrls if
+                         isinstance(ctrl, SyncDoneControl)), None)
+            if sync is None:
+                raise LdapProtocolError("Missing syncDoneControl")
+            yield from self._watch_res_search_result(sync)
+        else:
+            raise LdapProtocolError("Unrecognised message type")
+
+    def _bootstrap_cookie(self, msgid, stop, conn=None):
+        """Obtain synchronization cookie for a partitioned refresh
+
+        The syncrepl protocol provides no way to obtain a cookie other
+        than by performing a refresh.  A refresh only synchronization
+        requesting no attributes is therefore used, and its results
+        are discarded as they arrive.  The search is started before
+        any partitions are searched (so that the cookie represents a
+        state no later than that seen by the partition searches) but
+        is consumed concurrently with them, so that it adds little to
+        the overall duration of the bootstrap refresh.
+
+        The search is abandoned if the bootstrap refresh is stopped.
+        """
+        if conn is None:
+            conn = self.ldap
+        cookie = None
+        while True:
+            try:
+                res = LdapResult(*self._watch_result4(
+                    msgid, timeout=self.BOOTSTRAP_POLL, conn=conn
+                ))
+            except ldap.TIMEOUT:
+                if stop.is_set():
+                    conn.abandon(msgid)
+                    return None
+                continue
+            if res.type == ldap.RES_INTERMEDIATE:
+                for sync in (SyncInfoMessage(msg)
+                             for rname, msg, ctrls in res.data
+                             if rname == SyncInfoMessage.responseName):
+                    if sync.newcookie is not None:
+                        cookie = sync.newcookie
+            elif res.type == ldap.RES_SEARCH_RESULT:
                 sync = next((ctrl for ctrl in res.ctrls if
                              isinstance(ctrl, SyncDoneControl)), None)
                 if sync is None:
                     raise LdapProtocolError("Missing syncDoneControl")
-                yield from self._watch_res_search_result(sync)
+                return sync.cookie if sync.cookie is not None else cookie
+
+    def _bootstrap_search(self, partition):
+        """Retrieve all entries within a partition
+
+        Entries are retrieved using a paged search (to avoid exceeding
+        any server size limit), and are generated as each page arrives
+        rather than being accumulated in memory.
+        """
+        base = partition.get('base', self._watch_base[0])
+        search = self._watch_filter
+        if 'filter' in partition:
+            search = '(&%s%s)' % (search, partition['filter'])
+        logger.debug("Searching partition %s for %s", base, search)
+        conn = self.connect()
+        try:
+            paged = SimplePagedResultsControl(size=self.PAGE_SIZE, cookie='')
+            while True:
+                msgid = conn.search_ext(base, ldap.SCOPE_SUBTREE, search,
+                                        ['*', '+'], serverctrls=[paged])
+                _rtype, rdata, _rmsgid, rctrls = conn.result3(msgid)
+                for dn, attrs in rdata:
+                    if dn is not None:
+                        yield dn, attrs
+                paged.cookie = next((ctrl.cookie for ctrl in rctrls if
+                                     ctrl.controlType ==
+                                     SimplePagedResultsControl.controlType),
+                                    None)
+                if not paged.cookie:
+                    break
+        finally:
+            conn.unbind_s()
+
+    def _bootstrap(self):
+        """Perform partitioned parallel initial refresh
+
+        The configured partitions are searched concurrently, each over
+        a separate connection, with the retrieved entries passed back
+        via a bounded queue.  The partitions must collectively cover
+        all entries, since any unmentioned entries will be deleted.
+
+        The cookie search is started (over a further separate
+        connection) before any entries are retrieved, and so a
+        subsequent synchronization resuming from this cookie will
+        include any changes made while the partitions were being
+        retrieved.  Such changes may therefore be seen twice, but can
+        never be missed.
+        """
+        # pylint: disable=too-many-locals
+        partitions = self.config.partitions
+        logger.info("Bootstrapping from %d partitions", len(partitions))
+        results: queue.Queue = queue.Queue(self.BOOTSTRAP_QUEUE)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=self.BOOTSTRAP_POLL)
+                    return
+                except queue.Full:
+                    pass
+
+        def search(partition):
+            try:
+                for item in self._bootstrap_search(partition):
+                    if stop.is_set():
+                        break
+                    put(item)
+            finally:
+                put(done)
+
+        conn = self.connect()
+        executor = ThreadPoolExecutor(max_workers=len(partitions) + 1)
+        try:
+            msgid = self._watch_search_ext(persist=False, attrs=['1.1'],
+                                           conn=conn)
+            cookie = executor.submit(self._bootstrap_cookie, msgid, stop,
+                                     conn)
+            futures = [executor.submit(search, x) for x in partitions]
+            remaining = len(futures)
+            while remaining:
+                item = results.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                dn, attrs = item
+                entry = self._entry(dn, attrs)
+                if entry.uuid is None:
+                    raise LdapProtocolError("Missing UUID for %s" % dn)
+                if self._watch_within(dn, entry):
+                    yield entry
+            for future in futures:
+                future.result()
+            newcookie = cookie.result()
+        finally:
+            stop.set()
+            executor.shutdown()
+            conn.unbind_s()
+        yield RefreshComplete(autodelete=True)
+        if newcookie is not None:
+            yield SyncCookie(newcookie)
+
+    def watch(self, cookie=None, persist=True, trace=False):
+        """Watch for database changes
+
+        If partitions are configured and there is no cookie from which
+        to resume, then the initial refresh is carried out using
+        parallel searches of each partition.
+        """
+        if cookie is None and self.config.partitions and not trace:
+            for event in self._bootstrap():
+                if isinstance(event, SyncCookie):
+                    cookie = event
+                yield event
+            if not persist or cookie is None:
+                return
+        for res in self._watch_search(cookie=cookie, persist=persist):
+            if trace:
+                yield res
+            yield from self._watch_result(res)
+            if res.type == ldap.RES_SEARCH_RESULT:
+                break
+
+    async def awatch(self, cookie=None, persist=True, trace=False):
+        """Watch for database changes asynchronously"""
+        if cookie is None and self.config.partitions and not trace:
+            async for event in aiterate(self._bootstrap()):
+                if isinstance(event, SyncCookie):
+                    cookie = event
+                yield event
+            if not persist or cookie is None:
+                return
+        async for res in self._awatch_search(cookie=cookie, persist=persist):
+            if trace:
+                yield res
+            for event in self._watch_result(res):
+                yield event
+            if res.type == ldap.RES_SEARCH_RESULT:
                 break
-            else:
-                raise LdapProtocolError("Unrecognised message type")
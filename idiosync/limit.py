@@ -0,0 +1,137 @@
+"""Destination database rate limiting"""
+
+from dataclasses import dataclass, field
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TokenBucket:
+    """A token bucket rate limiter
+
+    Tokens are replenished continuously at a fixed rate, up to a
+    maximum burst size.  Acquiring tokens that are not yet available
+    blocks the caller until they would have been replenished.
+    """
+
+    rate: Optional[float] = None
+    """Replenishment rate (in tokens per second), or ``None`` for no limit"""
+
+    burst: float = 1
+    """Maximum number of tokens"""
+
+    tokens: float = field(init=False, repr=False, default=0)
+    """Currently available tokens (may be negative)"""
+
+    updated: float = field(init=False, repr=False,
+                           default_factory=time.monotonic)
+    """Time at which available tokens were last calculated"""
+
+    lock: threading.Lock = field(init=False, repr=False,
+                                 default_factory=threading.Lock)
+    """Token lock"""
+
+    def __post_init__(self) -> None:
+        self.tokens = self.burst
+
+    def replenish(self):
+        """Replenish available tokens"""
+        now = time.monotonic()
+        if self.rate is not None:
+            self.tokens = min(self.tokens + (now - self.updated) * self.rate,
+                              self.burst)
+        self.updated = now
+
+    def configure(self, rate, burst):
+        """Change replenishment rate and maximum burst size"""
+        with self.lock:
+            self.replenish()
+            self.rate = rate
+            self.burst = burst
+            self.tokens = min(self.tokens, self.burst)
+
+    def acquire(self, count=1):
+        """Acquire tokens, waiting if necessary"""
+        with self.lock:
+            if self.rate is None:
+                return
+            self.replenish()
+            self.tokens -= count
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+
+@dataclass
+class RateLimits:
+    """Destination database write and commit rate limits
+
+    Limits are applied by the synchronizer, which blocks while waiting
+    for tokens to become available.  Since the source database watch
+    is consumed only as fast as events are applied, this backpressure
+    propagates to the source database reader via bounded buffers
+    rather than causing events to be dropped.
+
+    Limits may be changed while synchronization is running, via
+    :meth:`update`.
+    """
+
+    writes: Optional[float] = None
+    """Maximum entry writes per second"""
+
+    commits: Optional[float] = None
+    """Maximum commits per second"""
+
+    burst: Optional[float] = None
+    """Maximum burst size (defaulting to one second's worth)"""
+
+    buckets: Dict[str, TokenBucket] = field(init=False, repr=False,
+                                            compare=False)
+    """Token buckets"""
+
+    def __post_init__(self) -> None:
+        for k in ('writes', 'commits', 'burst'):
+            value = getattr(self, k)
+            if value is not None and (isinstance(value, bool) or
+                                      not isinstance(value, (int, float)) or
+                                      value <= 0):
+                raise ValueError("Invalid %s limit %r" % (k, value))
+        self.buckets = {
+            'writes': TokenBucket(),
+            'commits': TokenBucket(),
+        }
+        self.configure()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in ('writes', 'commits', 'burst')}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)  # type: ignore[misc]
+
+    def configure(self):
+        """Apply configured limits to token buckets"""
+        for k, bucket in self.buckets.items():
+            rate = getattr(self, k)
+            burst = self.burst if self.burst is not None else (rate or 1)
+            bucket.configure(rate, max(burst, 1))
+
+    def update(self, other):
+        """Update limits in place"""
+        if other != self:
+            logger.info("Changing rate limits from %s to %s", self, other)
+        self.writes = other.writes
+        self.commits = other.commits
+        self.burst = other.burst
+        self.configure()
+
+    def write(self, count=1):
+        """Wait for permission to write entries"""
+        self.buckets['writes'].acquire(count)
+
+    def commit(self):
+        """Wait for permission to commit"""
+        self.buckets['commits'].acquire()
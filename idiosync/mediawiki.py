@@ -1,14 +1,16 @@
 """MediaWiki user database"""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from sqlalchemy import Column, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import relationship
+from typing import ClassVar, Dict, List, Optional
+from sqlalchemy import (Column, ForeignKey, Integer, String, Text, and_,
+                        exists, select)
+from sqlalchemy.orm import relationship, joinedload, selectinload
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.associationproxy import association_proxy
-from .sqlalchemy import (BinaryString, UnsignedInteger, UuidChar, SqlModel,
-                         SqlAttribute, SqlUser, SqlSyncId, SqlStateModel,
-                         SqlState, SqlConfig, SqlDatabase)
+from .sqlalchemy import (BinaryString, UnsignedInteger, UuidBinary,
+                         SqlModel, SqlAttribute, SqlUser, SqlSyncId,
+                         SqlStateModel, SqlState, SqlConfig, SqlDatabase)
 from .dummy import DummyGroup
 
 ##############################################################################
@@ -34,10 +36,10 @@ class OrmUser(Base):
     user_groups = relationship('OrmUserGroup', back_populates='user',
                                cascade='all, delete-orphan')
     ipblocks = relationship('OrmIpBlock', back_populates='user',
-                            lazy='joined', cascade='all, delete-orphan')
+                            cascade='all, delete-orphan')
 
     idiosync_user = relationship('OrmIdiosyncUser', back_populates='user',
-                                 uselist=False, lazy='joined',
+                                 uselist=False,
                                  cascade='all, delete-orphan',
                                  passive_deletes=True)
     user_idiosyncid = association_proxy('idiosync_user', 'idu_syncid')
@@ -84,7 +86,7 @@ class OrmIdiosyncUser(SqlSyncId, Base):
                       ForeignKey('user.user_id', onupdate='CASCADE',
                                  ondelete='CASCADE'),
                       primary_key=True)
-    idu_syncid = Column(UuidChar, nullable=False, unique=True)
+    idu_syncid = Column(UuidBinary, nullable=False, unique=True)
 
     user = relationship('OrmUser', back_populates='idiosync_user')
 
@@ -124,10 +126,32 @@ class MediaWikiUser(SqlUser):
     """A MediaWiki user"""
 
     model = SqlModel(OrmUser, 'user_name', syncid='user_idiosyncid')
+    profiles = {
+        'sync': [joinedload(OrmUser.ipblocks)],
+        'list': [selectinload(OrmUser.ipblocks),
+                 selectinload(OrmUser.idiosync_user)],
+    }
     uid = MediaWikiUidAttribute('user_name')
     displayName = SqlAttribute('user_real_name')
     mail = SqlAttribute('user_email')
 
+    @classmethod
+    def prepare(cls):
+        """Prepare for use as part of an idiosync user database
+
+        Blocks created by earlier versions recorded the external
+        (lower-cased) user name as the block address.  Such blocks are
+        updated to record the stored user name, as MediaWiki itself
+        does.
+        """
+        super().prepare()
+        query = cls.db.query(OrmIpBlock, OrmUser.user_name).join(
+            OrmUser, OrmIpBlock.ipb_user == OrmUser.user_id
+        ).filter(OrmIpBlock.ipb_address != OrmUser.user_name)
+        for block, name in query:
+            if block.ipb_address == cls.format_uid(name):
+                block.ipb_address = name
+
     @property
     def enabled(self):
         """User is enabled"""
@@ -139,7 +163,29 @@ class MediaWikiUser(SqlUser):
         if value:
             self.row.ipblocks.clear()
         else:
-            self.row.ipblocks.append(OrmIpBlock(ipb_address=self.uid))
+            self.row.ipblocks.append(
+                OrmIpBlock(ipb_address=self.row.user_name)
+            )
+
+    @classmethod
+    def enable_syncids(cls, syncids, enabled=True, invert=False):
+        """Enable (or disable) users by synchronization identifier"""
+        ids = cls.select_syncids(syncids, invert=invert)
+        ipblocks = OrmIpBlock.__table__
+        if enabled:
+            cls.db.execute(ipblocks.delete().where(
+                OrmIpBlock.ipb_user.in_(ids)
+            ))
+        else:
+            blocked = select([OrmIpBlock.ipb_id]).where(
+                OrmIpBlock.ipb_user == OrmUser.user_id
+            )
+            query = select([OrmUser.user_name, OrmUser.user_id]).where(and_(
+                OrmUser.user_id.in_(ids), ~exists(blocked)
+            ))
+            cls.db.execute(ipblocks.insert().from_select(
+                [OrmIpBlock.ipb_address, OrmIpBlock.ipb_user], query
+            ))
 
     @classmethod
     def format_uid(cls, name):
@@ -181,14 +227,31 @@ class MediaWikiGroup(DummyGroup):
     the ``user_group`` table.
     """
 
+    members: Optional[List[int]] = field(default=None, repr=False,
+                                         compare=False)
+    """Member user identifiers (if already loaded)"""
+
+    MEMBER_BATCH: ClassVar[int] = 500
+    """Number of member user rows to load within each query"""
+
     @property
     def users(self):
         """Users who are members of this group"""
+        if self.members is not None:
+            return (self.db.User(x) for x in self.member_rows())
         query = self.db.query(OrmUser).join(OrmUserGroup).filter(
             OrmUserGroup.ug_group == self.key
-        )
+        ).options(*self.db.User.profiles['list'])
         return (self.db.User(x) for x in query)
 
+    def member_rows(self):
+        """Load member user rows by (already loaded) identifier"""
+        for i in range(0, len(self.members), self.MEMBER_BATCH):
+            ids = self.members[i:i + self.MEMBER_BATCH]
+            yield from self.db.query(OrmUser).filter(
+                OrmUser.user_id.in_(ids)
+            ).options(*self.db.User.profiles['list'])
+
 
 class MediaWikiState(SqlState):
     """MediaWiki user database synchronization state"""
@@ -213,6 +276,21 @@ class MediaWikiDatabase(SqlDatabase):
 
     @property
     def groups(self):
-        """All groups"""
-        query = self.query(OrmUserGroup.ug_group).distinct()
-        return (self.Group(x.ug_group) for x in query)
+        """All groups
+
+        Group memberships (as group names and user identifiers only)
+        are retrieved in a single query and used to prepopulate the
+        member user identifiers for each group, avoiding a separate
+        membership query for each group.  The membership of each
+        returned group is therefore a snapshot taken when the group
+        was constructed.  Member user rows are loaded only if the
+        group's users are requested.
+
+        A group is listed even if its memberships refer only to users
+        that no longer exist.
+        """
+        query = self.query(OrmUserGroup.ug_group, OrmUserGroup.ug_user)
+        members: Dict[str, List[int]] = {}
+        for group, user_id in query:
+            members.setdefault(group, []).append(user_id)
+        return (self.Group(k, members=v) for k, v in members.items())
@@ -1,9 +1,44 @@
 """Plugin registration"""
 
-from pkg_resources import iter_entry_points
+from collections.abc import Mapping
 
 __all__ = [
     'plugins',
 ]
 
-plugins = {ep.name: ep.load() for ep in iter_entry_points(__name__)}
+
+class Plugins(Mapping):
+    """Registered plugins
+
+    Plugins are loaded lazily by name, so that using one plugin does
+    not incur the cost of importing every other registered plugin
+    (along with all of its dependencies).
+    """
+
+    def __init__(self, group):
+        self.group = group
+        self.loaded = {}
+
+    def entry_points(self, name=None):
+        """Iterate over registered entry points"""
+        # pylint: disable=import-outside-toplevel
+        from pkg_resources import iter_entry_points
+        return iter_entry_points(self.group, name)
+
+    def __getitem__(self, name):
+        if name not in self.loaded:
+            for ep in self.entry_points(name):
+                self.loaded[name] = ep.load()
+                break
+            else:
+                raise KeyError(name)
+        return self.loaded[name]
+
+    def __iter__(self):
+        return iter(dict.fromkeys(ep.name for ep in self.entry_points()))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+plugins = Plugins(__name__)
@@ -1,12 +1,22 @@
 """Request Tracker (RT) user database"""
 
-from sqlalchemy import Column, Enum, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import relationship
+from collections import defaultdict
+import logging
+from typing import ClassVar
+import uuid
+from sqlalchemy import (Column, Enum, ForeignKey, Integer, String, Text, and_,
+                        Sequence, bindparam, event, func, or_, select,
+                        update)
+from sqlalchemy.orm import (object_session, relationship, joinedload,
+                            selectinload)
+from sqlalchemy.orm.attributes import get_history
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.declarative import declarative_base
-from .sqlalchemy import (UuidChar, SqlModel, SqlAttribute, SqlEntry, SqlUser,
-                         SqlGroup, SqlSyncId, SqlStateModel, SqlState,
-                         SqlConfig, SqlDatabase)
+from .sqlalchemy import (UuidBinary, SqlModel, SqlAttribute, SqlEntry,
+                         SqlUser, SqlGroup, SqlSyncId, SqlStateModel,
+                         SqlState, SqlConfig, SqlDatabase)
+
+logger = logging.getLogger(__name__)
 
 ##############################################################################
 #
@@ -46,13 +56,13 @@ class OrmUser(Base):
     WorkPhone = Column(String)
     MobilePhone = Column(String)
 
-    principal = relationship('OrmPrincipal', back_populates='user',
-                             lazy='joined')
-    memberships = relationship('OrmMember', back_populates='user')
+    principal = relationship('OrmPrincipal', back_populates='user')
+    memberships = relationship('OrmMember', back_populates='user',
+                               cascade='all, delete-orphan')
     groups = association_proxy('memberships', 'group')
 
     idiosync_user = relationship('OrmIdiosyncUser', back_populates='user',
-                                 uselist=False, lazy='joined',
+                                 uselist=False,
                                  cascade='all, delete-orphan',
                                  passive_deletes=True)
     IdiosyncId = association_proxy('idiosync_user', 'IdiosyncId')
@@ -71,13 +81,13 @@ class OrmGroup(Base):
     Name = Column(String, unique=True)
     Description = Column(String)
 
-    principal = relationship('OrmPrincipal', back_populates='group',
-                             lazy='joined')
-    memberships = relationship('OrmMember', back_populates='group')
+    principal = relationship('OrmPrincipal', back_populates='group')
+    memberships = relationship('OrmMember', back_populates='group',
+                               cascade='all, delete-orphan')
     users = association_proxy('memberships', 'user')
 
     idiosync_group = relationship('OrmIdiosyncGroup', back_populates='group',
-                                  uselist=False, lazy='joined',
+                                  uselist=False,
                                   cascade='all, delete-orphan',
                                   passive_deletes=True)
     IdiosyncId = association_proxy('idiosync_group', 'IdiosyncId')
@@ -92,10 +102,28 @@ class OrmMember(Base):
     GroupId = Column(Integer, ForeignKey('Groups.id'), nullable=False)
     MemberId = Column(Integer, ForeignKey('Users.id'), nullable=False)
 
-    user = relationship('OrmUser', back_populates='memberships',
-                        lazy='joined')
-    group = relationship('OrmGroup', back_populates='memberships',
-                         lazy='joined')
+    user = relationship('OrmUser', back_populates='memberships')
+    group = relationship('OrmGroup', back_populates='memberships')
+
+
+class OrmCachedMember(Base):
+    """An RT cached (transitive) group membership
+
+    RT uses this table for all permission checks.  Each group has a
+    self-referential row, each direct membership has a row with
+    ``Via`` referring to itself, and each indirect membership (via a
+    group that is itself a member of another group) has a row with
+    ``Via`` referring to the row for the containing membership.
+    """
+
+    __tablename__ = 'CachedGroupMembers'
+
+    id = Column(Integer, primary_key=True)
+    GroupId = Column(Integer)
+    MemberId = Column(Integer)
+    Via = Column(Integer)
+    ImmediateParentId = Column(Integer)
+    Disabled = Column(Integer, nullable=False, default=0)
 
 
 class OrmIdiosyncUser(SqlSyncId, Base):
@@ -106,7 +134,7 @@ class OrmIdiosyncUser(SqlSyncId, Base):
 
     id = Column(Integer, ForeignKey('Users.id', onupdate='CASCADE',
                                     ondelete='CASCADE'), primary_key=True)
-    IdiosyncId = Column(UuidChar, unique=True)
+    IdiosyncId = Column(UuidBinary, unique=True)
 
     user = relationship('OrmUser', back_populates='idiosync_user')
 
@@ -119,7 +147,7 @@ class OrmIdiosyncGroup(SqlSyncId, Base):
 
     id = Column(Integer, ForeignKey('Groups.id', onupdate='CASCADE',
                                     ondelete='CASCADE'), primary_key=True)
-    IdiosyncId = Column(UuidChar, unique=True)
+    IdiosyncId = Column(UuidBinary, unique=True)
 
     group = relationship('OrmGroup', back_populates='idiosync_group')
 
@@ -134,6 +162,232 @@ class OrmIdiosyncState(Base):
     Value = Column(Text)
 
 
+##############################################################################
+#
+# Principal identifier allocation
+
+
+class Principals:
+    """RT principal identifier allocation
+
+    Every RT user and group shares its identifier with a row in the
+    ``Principals`` table.  Left to itself, the ORM must insert each
+    principal individually in order to discover the generated
+    identifier before it can insert the corresponding user or group.
+    We instead allocate identifiers for all new principals before
+    each flush, in a single block per flush.  With all identifiers
+    known in advance, the ORM is able to insert the principals, the
+    users or groups, and the synchronization identifier mapping rows
+    as three multi-row inserts.
+    """
+
+    table = OrmPrincipal.__table__
+
+    sequence: ClassVar[Sequence] = Sequence('principals_id_seq')
+    """PostgreSQL principal identifier sequence"""
+
+    @classmethod
+    def allocate(cls, session, count):
+        """Allocate a block of principal identifiers
+
+        PostgreSQL identifiers are drawn directly from the sequence.
+        For other databases, the identifiers are reserved by inserting
+        (and then deleting) placeholder rows within a single multi-row
+        insert.  The generated identifiers are not necessarily
+        consecutive (e.g. when using a MySQL auto-increment step
+        greater than one, or when other sessions are inserting rows
+        concurrently), and so the placeholder rows are marked with a
+        unique principal type in order to identify them exactly.
+        """
+        conn = session.connection()
+        dialect = conn.dialect.name
+        if dialect == 'postgresql':
+            # pylint: disable=no-value-for-parameter
+            query = select([cls.sequence.next_value()]).select_from(
+                func.generate_series(1, count)
+            )
+            return [x for (x,) in conn.execute(query)]
+        if dialect not in ('mysql', 'sqlite'):
+            return None
+        marker = 'idiosync-%s' % uuid.uuid4().hex[:7]
+        result = conn.execute(cls.table.insert().values([
+            {'PrincipalType': marker, 'Disabled': 1}
+        ] * count))
+        # MySQL reports the first generated identifier, SQLite the last
+        last = result.lastrowid
+        first = (last if dialect == 'mysql' else last - count + 1)
+        placeholders = and_(cls.table.c.id >= first,
+                            cls.table.c.PrincipalType == marker)
+        ids = [x for (x,) in conn.execute(
+            select([cls.table.c.id]).where(placeholders)
+        )]
+        conn.execute(cls.table.delete().where(placeholders))
+        if len(ids) != count:
+            logger.warning("allocated %d of %d principal identifiers",
+                           len(ids), count)
+            return None
+        return ids
+
+    @classmethod
+    def before_flush(cls, session, _context, _instances):
+        """Allocate identifiers for new principals before flush"""
+        principals = [x for x in session.new
+                      if isinstance(x, OrmPrincipal) and x.id is None]
+        if len(principals) > 1:
+            ids = cls.allocate(session, len(principals))
+            if ids is not None:
+                for principal, pid in zip(principals, ids):
+                    principal.id = pid
+
+
+##############################################################################
+#
+# Cached group membership maintenance
+
+
+class CachedMembers:
+    """RT cached group membership maintenance
+
+    RT's own code updates ``CachedGroupMembers`` row by row as each
+    membership is created or deleted.  We instead record the group
+    and membership changes made within each flush (via mapper
+    events), and apply them to ``CachedGroupMembers`` after the flush
+    using a fixed number of bulk statements.
+    """
+
+    cgm = OrmCachedMember.__table__
+    parent = cgm.alias('parent')
+    principal = OrmPrincipal.__table__
+
+    group_id = bindparam('group_id', type_=Integer)
+    member_id = bindparam('member_id', type_=Integer)
+
+    insert_direct = cgm.insert().from_select(
+        ['GroupId', 'MemberId', 'ImmediateParentId', 'Disabled'],
+        select([group_id, member_id, group_id.label('parent_id'),
+                principal.c.Disabled])
+        .where(principal.c.id == group_id)
+    )
+    """Insert direct (or self-referential) membership"""
+
+    insert_indirect = cgm.insert().from_select(
+        ['GroupId', 'MemberId', 'Via', 'ImmediateParentId', 'Disabled'],
+        select([parent.c.GroupId, member_id, parent.c.id, group_id,
+                principal.c.Disabled])
+        .where(and_(parent.c.MemberId == group_id,
+                    parent.c.MemberId != parent.c.GroupId,
+                    principal.c.id == group_id))
+    )
+    """Insert indirect memberships via groups containing the group"""
+
+    update_via = cgm.update().where(cgm.c.Via.is_(None)).values(
+        Via=cgm.c.id
+    )
+    """Mark newly inserted direct memberships as referring to themselves"""
+
+    delete_member = cgm.delete().where(and_(
+        cgm.c.MemberId == member_id,
+        cgm.c.ImmediateParentId == group_id,
+    ))
+    """Delete direct and indirect memberships"""
+
+    delete_group = cgm.delete().where(or_(
+        cgm.c.GroupId == group_id,
+        cgm.c.MemberId == group_id,
+        cgm.c.ImmediateParentId == group_id,
+    ))
+    """Delete all memberships involving a group"""
+
+    update_disabled = cgm.update().where(
+        cgm.c.ImmediateParentId == group_id
+    ).values(Disabled=bindparam('disabled', type_=Integer))
+    """Update disabled status of memberships via a group"""
+
+    @staticmethod
+    def pending(target):
+        """Get pending changes within the flush containing a row"""
+        return object_session(target).info.setdefault(
+            'cached_members', defaultdict(list)
+        )
+
+    @classmethod
+    def after_flush(cls, session, _context):
+        """Update cached group memberships after flush"""
+        pending = session.info.pop('cached_members', {})
+        old_groups = pending.get('old_groups')
+        old_members = pending.get('old_members')
+        new_groups = pending.get('new_groups', [])
+        new_members = pending.get('new_members', [])
+        disabled = pending.get('disabled')
+        if old_groups:
+            session.execute(cls.delete_group, old_groups)
+        if old_members:
+            session.execute(cls.delete_member, old_members)
+        if new_groups or new_members:
+            session.execute(cls.insert_direct, new_groups + new_members)
+            session.execute(cls.update_via)
+        if new_members:
+            session.execute(cls.insert_indirect, new_members)
+        if disabled:
+            session.execute(cls.update_disabled, disabled)
+
+    @staticmethod
+    def after_rollback(session):
+        """Discard pending changes from a failed flush"""
+        session.info.pop('cached_members', None)
+
+    @classmethod
+    def update_disabled_groups(cls, db, ids, disabled):
+        """Update disabled status of memberships via groups"""
+        cgm = cls.cgm
+        db.execute(update(cgm).where(and_(
+            cgm.c.ImmediateParentId.in_(ids),
+            cgm.c.Disabled != disabled,
+        )).values(Disabled=disabled))
+
+
+@event.listens_for(OrmGroup, 'after_insert')
+def _insert_group(_mapper, _connection, target):
+    """Record group creation"""
+    CachedMembers.pending(target)['new_groups'].append(
+        {'group_id': target.id, 'member_id': target.id}
+    )
+
+
+@event.listens_for(OrmGroup, 'after_delete')
+def _delete_group(_mapper, _connection, target):
+    """Record group deletion"""
+    CachedMembers.pending(target)['old_groups'].append(
+        {'group_id': target.id}
+    )
+
+
+@event.listens_for(OrmMember, 'after_insert')
+def _insert_member(_mapper, _connection, target):
+    """Record membership creation"""
+    CachedMembers.pending(target)['new_members'].append(
+        {'group_id': target.GroupId, 'member_id': target.MemberId}
+    )
+
+
+@event.listens_for(OrmMember, 'after_delete')
+def _delete_member(_mapper, _connection, target):
+    """Record membership deletion"""
+    CachedMembers.pending(target)['old_members'].append(
+        {'group_id': target.GroupId, 'member_id': target.MemberId}
+    )
+
+
+@event.listens_for(OrmPrincipal, 'after_update')
+def _update_principal(_mapper, _connection, target):
+    """Record group disabled status changes"""
+    if (target.PrincipalType == 'Group' and
+            get_history(target, 'Disabled').has_changes()):
+        CachedMembers.pending(target)['disabled'].append(
+            {'group_id': target.id, 'disabled': target.Disabled}
+        )
+
+
 ##############################################################################
 #
 # User database model
@@ -152,25 +406,94 @@ class RequestTrackerEntry(SqlEntry):
         """User database entry is enabled"""
         self.row.principal.Disabled = (0 if value else 1)
 
+    @classmethod
+    def enable_syncids(cls, syncids, enabled=True, invert=False):
+        """Enable (or disable) entries by synchronization identifier"""
+        disabled = (0 if enabled else 1)
+        ids = cls.select_syncids(syncids, invert=invert)
+        cls.db.execute(update(OrmPrincipal.__table__).where(and_(
+            OrmPrincipal.id.in_(ids),
+            OrmPrincipal.Disabled != disabled,
+        )).values(Disabled=disabled))
+
 
 class RequestTrackerUser(SqlUser, RequestTrackerEntry):
     """An RT user"""
 
     model = SqlModel(OrmUser, 'Name', syncid='IdiosyncId', member='groups')
+    profiles = {
+        'lookup': [joinedload(OrmUser.principal),
+                   joinedload(OrmUser.idiosync_user)],
+        'sync': [joinedload(OrmUser.principal)],
+        'list': [selectinload(OrmUser.principal),
+                 selectinload(OrmUser.idiosync_user)],
+    }
     displayName = SqlAttribute('RealName')
     mail = SqlAttribute('EmailAddress')
     mobile = SqlAttribute('MobilePhone')
     telephoneNumber = SqlAttribute('WorkPhone')
     uid = SqlAttribute('Name')
 
+    @property
+    def groups(self):
+        """Groups of which this user is a member"""
+        ids = select([OrmMember.GroupId]).where(
+            OrmMember.MemberId == self.row.id
+        )
+        query = self.db.query(OrmGroup).filter(OrmGroup.id.in_(ids)).options(
+            *self.db.Group.profiles['list']
+        )
+        return (self.db.Group(x) for x in query)
+
 
 class RequestTrackerGroup(SqlGroup, RequestTrackerEntry):
     """An RT group"""
 
     model = SqlModel(OrmGroup, 'Name', syncid='IdiosyncId', member='users')
+    profiles = {
+        'lookup': [joinedload(OrmGroup.principal),
+                   joinedload(OrmGroup.idiosync_group)],
+        'sync': [joinedload(OrmGroup.principal)],
+        'list': [selectinload(OrmGroup.principal),
+                 selectinload(OrmGroup.idiosync_group)],
+    }
     commonName = SqlAttribute('Name')
     description = SqlAttribute('Description')
 
+    @property
+    def members(self):
+        """Member user identifiers and synchronization identifiers
+
+        This is a narrow projection of the group membership, avoiding
+        the need to load the full user rows.
+        """
+        query = select([OrmMember.MemberId, OrmIdiosyncUser.IdiosyncId])
+        query = query.select_from(OrmMember.__table__.outerjoin(
+            OrmIdiosyncUser.__table__,
+            OrmMember.MemberId == OrmIdiosyncUser.id,
+        )).where(OrmMember.GroupId == self.row.id)
+        return ((x.MemberId, x.IdiosyncId)
+                for x in self.db.session.execute(query))
+
+    @property
+    def users(self):
+        """Users who are members of this group"""
+        ids = select([OrmMember.MemberId]).where(
+            OrmMember.GroupId == self.row.id
+        )
+        query = self.db.query(OrmUser).filter(OrmUser.id.in_(ids)).options(
+            *self.db.User.profiles['list']
+        )
+        return (self.db.User(x) for x in query)
+
+    @classmethod
+    def enable_syncids(cls, syncids, enabled=True, invert=False):
+        """Enable (or disable) entries by synchronization identifier"""
+        super().enable_syncids(syncids, enabled=enabled, invert=invert)
+        ids = cls.select_syncids(syncids, invert=invert)
+        CachedMembers.update_disabled_groups(cls.db, ids,
+                                             (0 if enabled else 1))
+
 
 class RequestTrackerState(SqlState):
     """RT user database synchronization state"""
@@ -189,3 +512,10 @@ class RequestTrackerDatabase(SqlDatabase):
     User = RequestTrackerUser
     Group = RequestTrackerGroup
     State = RequestTrackerState
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        event.listen(self.session, 'before_flush', Principals.before_flush)
+        event.listen(self.session, 'after_flush', CachedMembers.after_flush)
+        event.listen(self.session, 'after_rollback',
+                     CachedMembers.after_rollback)
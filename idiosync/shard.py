@@ -0,0 +1,490 @@
+"""Sharded user database synchronization"""
+
+from dataclasses import dataclass, field
+import logging
+import math
+import multiprocessing
+import queue
+import traceback
+from typing import (Any, Callable, ClassVar, Dict, List, Optional, Set,
+                    Type)
+from uuid import UUID
+from .base import (Attribute, Entry, User, Group, Database, SyncCookie,
+                   SyncId, SyncIds, UnchangedSyncIds, DeletedSyncIds,
+                   RefreshComplete)
+from .sync import Synchronizer
+
+logger = logging.getLogger(__name__)
+
+ShardSchema = Dict[str, Dict[str, bool]]
+"""Shared attribute names (and multiplicity) for each entry type"""
+
+
+class ShardError(Exception):
+    """A shard worker process failed"""
+
+    def __str__(self):
+        return "Shard %d failed: %s" % self.args
+
+
+##############################################################################
+#
+# Source database entry snapshots
+
+
+@dataclass
+class ShardEntry(Entry):
+    """A detached snapshot of a source database entry
+
+    Source database entries are generally bound to a live database
+    connection and so cannot be passed to a worker process.  A
+    snapshot captures only the values required for synchronization.
+    """
+
+    key: str = None
+    uuid: UUID = None
+    enabled: bool = True
+    values: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self) -> None:
+        self.__dict__.update(self.values)
+
+    @classmethod
+    def snapshot(cls, entry, attrs):
+        """Construct snapshot of source database entry"""
+        return cls(key=entry.key, uuid=entry.uuid, enabled=entry.enabled,
+                   values={x: getattr(entry, x) for x in attrs})
+
+
+@dataclass
+class ShardUser(ShardEntry, User):
+    """A detached snapshot of a source database user"""
+
+
+@dataclass
+class ShardGroup(ShardEntry, Group):
+    """A detached snapshot of a source database group"""
+
+
+class ShardSource:
+    """A stand-in source database within a shard worker process
+
+    This provides only the entry types (with their shared attributes)
+    required to construct a :class:`~idiosync.sync.Synchronizer`.
+    """
+
+    def __init__(self, schema: ShardSchema) -> None:
+        self.User = self.entry_type(ShardUser, schema['User'])
+        self.Group = self.entry_type(ShardGroup, schema['Group'])
+
+    @staticmethod
+    def entry_type(base, attrs):
+        """Construct entry type with shared attributes"""
+        return type(base.__name__, (base,), {
+            k: Attribute(multi=v) for k, v in attrs.items()
+        })
+
+
+##############################################################################
+#
+# Shard worker processes
+
+
+@dataclass
+class ShardWorkerSynchronizer(Synchronizer):
+    """A user database synchronizer within a shard worker process
+
+    Dead letters recorded or cleared by the worker are reported back
+    to the coordinating process, which is responsible for retrying
+    failed entries.
+    """
+
+    report: Optional[Callable[..., None]] = field(default=None, repr=False)
+    """Report a dead letter change to the coordinating process"""
+
+    def deadletter(self, src, strict, exc):
+        """Record entry that could not be synchronized"""
+        super().deadletter(src, strict, exc)
+        syncid = SyncId.from_uuid(src.uuid)
+        self.report('deadletter', syncid, str(self.deadletters[syncid]))
+
+    def recovered(self, src):
+        """Clear any dead letter for a successfully synchronized entry"""
+        syncid = SyncId.from_uuid(src.uuid)
+        if syncid in self.deadletters:
+            self.report('recovered', syncid)
+        super().recovered(src)
+
+    def request(self, op, *args):
+        """Apply a single synchronization request
+
+        Returns True if changes should be committed immediately.
+        """
+        if op == 'entry':
+            src, strict, commit = args
+            self.entries.apply([(src, strict)])
+            return commit
+        if op == 'delete':
+            syncids, delete, commit = args
+            self.delete(SyncIds(syncids), delete=delete)
+            return commit
+        if op == 'abandon':
+            syncid, = args
+            if syncid in self.deadletters:
+                self.abandon(syncid)
+            return False
+        if op == 'commit':
+            return True
+        raise ValueError(op)
+
+
+def shard_worker(index, config, schema, requests, responses, *, chunk):
+    """Apply synchronization requests within a shard worker process
+
+    Changes are committed at each commit barrier, for each urgent
+    request, and after every ``chunk`` requests, so that concurrent
+    workers do not hold their destination database transactions open
+    for the duration of a refresh.
+    """
+    # pylint: disable=too-many-arguments
+    try:
+        dst = config.database
+        syncer = ShardWorkerSynchronizer(
+            ShardSource(schema), dst, prepared=True,
+            report=lambda op, *args: responses.put((op, index, *args)),
+        )
+        syncer.start()
+        pending = 0
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            pending += 1
+            if syncer.request(*request) or pending >= chunk:
+                dst.commit()
+                pending = 0
+            op, *args = request
+            if op == 'commit':
+                responses.put(('commit', index, *args))
+    except Exception:  # pylint: disable=broad-except
+        responses.put(('error', index, traceback.format_exc()))
+
+
+@dataclass
+class ShardPool:
+    """A pool of shard worker processes"""
+
+    processes: List[Any] = field(default_factory=list)
+    """Shard worker processes"""
+
+    requests: List[Any] = field(default_factory=list)
+    """Shard worker request queues"""
+
+    responses: Optional[Any] = field(default=None, repr=False)
+    """Shard worker response queue"""
+
+    maxsize: ClassVar[int] = 1024
+    """Maximum number of pending requests for each shard"""
+
+    timeout: ClassVar[float] = 1
+    """Interval between shard worker liveness checks"""
+
+    def start(self, shards, config, schema, chunk):
+        """Start shard worker processes"""
+        ctx = multiprocessing.get_context('spawn')
+        self.responses = ctx.Queue()
+        for index in range(shards):
+            requests = ctx.Queue(self.maxsize)
+            process = ctx.Process(
+                target=shard_worker, name='idiosync-shard-%d' % index,
+                args=(index, config, schema, requests, self.responses),
+                kwargs={'chunk': chunk},
+                daemon=True,
+            )
+            process.start()
+            self.requests.append(requests)
+            self.processes.append(process)
+
+    def check(self):
+        """Check for failed shard worker processes"""
+        for index, process in enumerate(self.processes):
+            if not process.is_alive():
+                # Report the failure as described by the worker, if any
+                try:
+                    while True:
+                        self.receive(block=False)
+                except queue.Empty:
+                    pass
+                raise ShardError(index, "exit code %s" % process.exitcode)
+
+    def receive(self, block=True):
+        """Receive shard worker response"""
+        op, index, *args = self.responses.get(block=block,
+                                              timeout=self.timeout)
+        if op == 'error':
+            raise ShardError(index, *args)
+        return (op, index, *args)
+
+    def send(self, index, request):
+        """Send request to shard worker
+
+        The request queues are bounded, so a slow shard will
+        eventually stall the source database watch rather than
+        consuming unbounded memory.
+        """
+        while True:
+            try:
+                self.requests[index].put(request, timeout=self.timeout)
+                return
+            except queue.Full:
+                self.check()
+
+    def close(self):
+        """Shut down shard worker processes"""
+        for requests, process in zip(self.requests, self.processes):
+            if process.is_alive():
+                try:
+                    requests.put(None, timeout=self.timeout)
+                except queue.Full:
+                    process.terminate()
+        for process in self.processes:
+            process.join()
+        self.requests = []
+        self.processes = []
+
+
+##############################################################################
+#
+# Sharded synchronizer
+
+
+@dataclass
+class ShardCoordinator(Synchronizer):
+    """A coordinating synchronizer for sharded destination writes
+
+    Entries are never synchronized directly by the coordinator.  Dead
+    letters are recorded by the shard workers and reported back to the
+    coordinator, which routes failed entries that are due for retry
+    back to the relevant shard workers.
+    """
+
+    router: Any = field(default=None, repr=False, compare=False)
+    """Sharded synchronizer routing requests to shard workers"""
+
+    def abandon(self, syncid):
+        """Abandon a failed entry that is no longer present"""
+        del self.deadletters[syncid]
+        self.router.pool.send(self.router.shard(syncid), ('abandon', syncid))
+
+    def resync(self, src, strict):
+        """Retry synchronization of a failed entry"""
+        # Avoid retrying again until the outcome has been reported
+        self.deadletters[SyncId.from_uuid(src.uuid)].retry = math.inf
+        self.router.entry(src, strict=strict)
+
+
+ShardCoordinator_ = ShardCoordinator
+ShardPool_ = ShardPool
+
+
+@dataclass
+class ShardedSynchronizer:
+    """A user database synchronizer with sharded destination writes
+
+    Source database entries are routed by synchronization identifier
+    to one of several worker processes, each with its own destination
+    database connection.  Attribute synchronization and ORM work are
+    therefore spread across multiple cores, while all changes to any
+    single entry are still applied in order by a single worker.
+
+    The coordinating process retains its own destination database
+    connection, which owns the synchronization cookie.  The cookie is
+    advanced only once every shard has committed all events preceding
+    it, and unmentioned entries are deleted at the end of a refresh
+    only once every shard has committed the refreshed entries.
+
+    The destination database configuration must be picklable, since it
+    is passed to each worker process.
+    """
+
+    src: Database
+    """Source database"""
+
+    dst: Any
+    """Destination database configuration"""
+
+    shards: int = 2
+    """Number of shard worker processes"""
+
+    syncer: ShardCoordinator_ = field(init=False, repr=False)
+    """Coordinating synchronizer"""
+
+    schema: ShardSchema = field(init=False, repr=False)
+    """Shared attribute names (and multiplicity) for each entry type"""
+
+    pool: ShardPool_ = field(init=False, repr=False,
+                             default_factory=ShardPool)
+    """Shard worker processes"""
+
+    barriers: int = field(init=False, repr=False, default=0)
+    """Number of commit barriers issued"""
+
+    Synchronizer: ClassVar[Type[ShardCoordinator_]] = ShardCoordinator
+
+    chunk: ClassVar[int] = 100
+    """Maximum number of requests applied by a shard between commits"""
+
+    def __post_init__(self) -> None:
+        if self.shards < 1:
+            raise ValueError("Invalid number of shards %d" % self.shards)
+        self.syncer = self.Synchronizer(self.src, self.dst.database,
+                                        limits=getattr(self.dst, 'limits',
+                                                       None),
+                                        router=self)
+        self.schema = {
+            'User': {x: getattr(self.syncer.user.Src, x).multi
+                     for x in self.syncer.user.attrs},
+            'Group': {x: getattr(self.syncer.group.Src, x).multi
+                      for x in self.syncer.group.attrs},
+        }
+
+    def shard(self, syncid: UUID) -> int:
+        """Identify shard for a synchronization identifier"""
+        return syncid.int % self.shards
+
+    def start(self):
+        """Start synchronization
+
+        The destination database is prepared, the shard worker
+        processes are started, and the synchronization cookie from
+        which to resume watching the source database is returned.
+        """
+        cookie = self.syncer.start()
+        self.syncer.dst.commit()
+        if not self.pool.processes:
+            self.pool.start(self.shards, self.dst, self.schema, self.chunk)
+        return cookie
+
+    def response(self):
+        """Receive shard worker commit barrier response
+
+        Dead letter changes reported by the shard workers are recorded
+        by the coordinating synchronizer.
+        """
+        while True:
+            op, index, *args = self.pool.receive()
+            if op == 'deadletter':
+                syncid, letter = args
+                self.syncer.deadletters[syncid] = \
+                    self.syncer.deadletters.DeadLetter.parse(letter)
+            elif op == 'recovered':
+                syncid, = args
+                self.syncer.deadletters.pop(syncid, None)
+            else:
+                return (index, *args)
+
+    def barrier(self):
+        """Wait for all shards to commit all preceding requests"""
+        if self.syncer.limits is not None:
+            self.syncer.limits.commit()
+        self.barriers += 1
+        for index in range(self.shards):
+            self.pool.send(index, ('commit', self.barriers))
+        pending = set(range(self.shards))
+        while pending:
+            try:
+                index, barrier = self.response()
+            except queue.Empty:
+                self.pool.check()
+                continue
+            if barrier == self.barriers:
+                pending.discard(index)
+
+    def entry(self, src, strict=False, commit=True):
+        """Route source database entry snapshot to shard"""
+        if self.syncer.limits is not None:
+            self.syncer.limits.write()
+        syncid = SyncId.from_uuid(src.uuid)
+        if isinstance(src, User):
+            snapshot = ShardUser.snapshot(src, self.schema['User'])
+        else:
+            snapshot = ShardGroup.snapshot(src, self.schema['Group'])
+        self.pool.send(self.shard(syncid), ('entry', snapshot, strict, commit))
+
+    def deleted(self, syncids, delete=False, commit=True):
+        """Route deleted synchronization identifiers to shards"""
+        if self.syncer.limits is not None:
+            self.syncer.limits.write()
+        routed: Dict[int, Set[UUID]] = {}
+        for syncid in syncids:
+            routed.setdefault(self.shard(syncid), set()).add(syncid)
+        for index, deleted in routed.items():
+            self.pool.send(index, ('delete', deleted, delete, commit))
+
+    def apply(self, src, strict=False, delete=False):
+        """Apply a single source database watch event"""
+        syncids = self.syncer.syncids
+        commit = syncids is None or self.syncer.urgent(src)
+
+        if isinstance(src, Entry):
+
+            # Route entry snapshot to shard
+            if syncids is not None:
+                syncids |= {SyncId.from_uuid(src.uuid)}
+            self.entry(src, strict=strict, commit=commit)
+
+        elif isinstance(src, UnchangedSyncIds):
+
+            # Add to list of observed synchronization identifiers
+            if syncids is not None:
+                syncids |= set(src)
+
+        elif isinstance(src, DeletedSyncIds):
+
+            # Route deleted synchronization identifiers to shards
+            self.deleted(src, delete=delete, commit=commit)
+
+        elif isinstance(src, RefreshComplete):
+
+            # Wait for all refreshed entries to be committed
+            self.barrier()
+            self.syncer.apply(src, strict=strict, delete=delete)
+
+        elif isinstance(src, SyncCookie):
+
+            # Wait for all preceding events to be committed
+            if commit:
+                self.barrier()
+            self.syncer.apply(src, strict=strict, delete=delete)
+
+        else:
+
+            raise TypeError(src)
+
+    def sync(self, persist=True, strict=False, delete=False, coalesce=None,
+             batch=None):
+        """Synchronize database
+
+        Refresh work is committed by each shard in fixed size chunks
+        (and at commit barriers), and so adaptive batching is not
+        supported.
+        """
+        if batch:
+            raise ValueError("Batching is not supported with shards")
+        try:
+            cookie = self.start()
+            for src in self.syncer.watch(cookie=cookie, persist=persist,
+                                         coalesce=coalesce):
+                self.apply(src, strict=strict, delete=delete)
+            self.barrier()
+        finally:
+            self.close()
+
+    @property
+    def metrics(self):
+        """Current synchronization metrics"""
+        return self.syncer.metrics
+
+    def close(self):
+        """Shut down shard worker processes"""
+        self.pool.close()
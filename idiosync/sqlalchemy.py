@@ -1,24 +1,38 @@
 """SQLAlchemy user database"""
 
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from functools import lru_cache
+import hashlib
 import logging
-from typing import Any, ClassVar, Mapping, Optional, Type
+from typing import (TYPE_CHECKING, Any, ClassVar, Dict, Mapping, Optional,
+                    Sequence, Set, Type)
 import uuid
 import sqlalchemy
-from sqlalchemy import create_engine, inspect, and_
+from sqlalchemy import (create_engine, event, inspect, and_, bindparam,
+                        select, update, Column, Table)
 from sqlalchemy.orm import sessionmaker, contains_eager
+from sqlalchemy.exc import (DataError, DBAPIError, IntegrityError,
+                            OperationalError)
+from sqlalchemy.ext import baked
 from sqlalchemy.types import TypeDecorator, BINARY, VARBINARY, Integer, String
 from sqlalchemy.schema import MetaData
-from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.ext.associationproxy import ASSOCIATION_PROXY
-import alembic
 from .base import (Attribute, WritableEntry, WritableUser, WritableGroup,
-                   Config, State, WritableDatabase)
+                   Config, State, WritableDatabase, SyncId)
+
+if TYPE_CHECKING:
+    import alembic.operations  # pylint: disable=ungrouped-imports
 
 NAMESPACE_SQL = uuid.UUID('b3c23456-05d8-4be5-b173-b57aeb30b4f4')
 
 logger = logging.getLogger(__name__)
 
+# The SQLAlchemy type stubs erroneously describe the bakery factory
+# function as being itself a bakery
+bakery = baked.bakery()  # type: ignore[call-arg,func-returns-value]
+
 SqlOrm = Any
 
 
@@ -101,7 +115,7 @@ class UuidBinary(TypeDecorator):
         """Decode raw column value to UUID object"""
         if value is None or dialect.name == 'postgresql':
             return value
-        return uuid.UUID(bytes=value)
+        return SyncId.from_bytes(value)
 
 
 class UuidChar(TypeDecorator):
@@ -135,9 +149,7 @@ class UuidChar(TypeDecorator):
         """Decode raw column value to UUID object"""
         if value is None or dialect.name == 'postgresql':
             return value
-        if isinstance(value, bytes):
-            return uuid.UUID(value.decode())
-        return uuid.UUID(value)
+        return SyncId.from_str(value)
 
 
 ##############################################################################
@@ -192,6 +204,18 @@ class SqlEntry(WritableEntry, metaclass=SqlEntryMeta):
     uuid_ns: ClassVar[uuid.UUID] = None
     """UUID namespace for entries within this table"""
 
+    CACHE_SIZE: ClassVar[int] = 4096
+    """Maximum number of cached permanent identifiers"""
+
+    profiles: ClassVar[Mapping[str, Sequence[Any]]] = {}
+    """Loader options for each named loading profile
+
+    The ``lookup`` profile is used for lookups by canonical key, the
+    ``sync`` profile is used for lookups by synchronization identifier
+    (which are generally followed by attribute synchronization), and
+    the ``list`` profile is used when listing multiple entries.
+    """
+
     @property
     def key(self):
         """Canonical lookup key"""
@@ -200,8 +224,13 @@ class SqlEntry(WritableEntry, metaclass=SqlEntryMeta):
     @property
     def uuid(self):
         """Permanent identifier for this entry"""
-        identity = inspect(self.row).identity
-        return uuid.uuid5(self.uuid_ns, ':'.join(str(x) for x in identity))
+        return self.derive_uuid(self.uuid_ns, inspect(self.row).identity)
+
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def derive_uuid(namespace, identity):
+        """Derive permanent identifier from row identity"""
+        return uuid.uuid5(namespace, ':'.join(str(x) for x in identity))
 
     @property
     def syncid(self):
@@ -213,43 +242,99 @@ class SqlEntry(WritableEntry, metaclass=SqlEntryMeta):
         """Synchronization identifier"""
         setattr(self.row, self.model.syncid, value)
 
+    @classmethod
+    def baked(cls, profile, *args):
+        """Construct baked query for this table
+
+        The query construction and SQL compilation are cached for
+        each distinct model, loading profile, and set of additional
+        cache key arguments.
+        """
+        model = cls.model
+        options = cls.profiles.get(profile, ())
+        query = bakery(lambda session: session.query(model.orm),
+                       model.orm, model.key, model.syncid, profile, *args)
+        if options:
+            query.add_criteria(lambda q: q.options(*options))
+        return query
+
     @classmethod
     def find(cls, key):
         """Look up user database entry"""
-        query = cls.db.query(cls.model.orm)
-        attr = getattr(cls.model.orm, cls.model.key)
-        row = query.filter(attr == key).one_or_none()
+        query = cls.baked('lookup')
+        query += lambda q: q.filter(
+            getattr(cls.model.orm, cls.model.key) == bindparam('key')
+        )
+        row = query(cls.db.session).params(key=key).one_or_none()
         return cls(row) if row is not None else None
 
     @classmethod
-    def query_syncid(cls, search):
-        """Query user database by synchronization identifier"""
-        query = cls.db.query(cls.model.orm)
-        attr = getattr(cls.model.orm, cls.model.syncid)
-        desc = inspect(cls.model.orm).all_orm_descriptors[cls.model.syncid]
-        if desc.extension_type is ASSOCIATION_PROXY:
-            # Use inner join and a direct filter on the proxied column
-            # to improve query efficiency
-            query = query.join(attr.local_attr).options(
-                contains_eager(attr.local_attr)
-            )
-            attr = attr.remote_attr
-        return query.filter(search(attr))
+    def query_syncid(cls, search, profile='sync'):
+        """Query user database by synchronization identifier
+
+        The search criterion is invoked only when the baked query is
+        first constructed, and so must use bound parameters for any
+        values that vary between invocations.
+        """
+        def criteria(query):
+            attr = getattr(cls.model.orm, cls.model.syncid)
+            desc = inspect(cls.model.orm).all_orm_descriptors[
+                cls.model.syncid
+            ]
+            if desc.extension_type is ASSOCIATION_PROXY:
+                # Use inner join and a direct filter on the proxied column
+                # to improve query efficiency
+                query = query.join(attr.local_attr).options(
+                    contains_eager(attr.local_attr)
+                )
+                attr = attr.remote_attr
+            return query.filter(search(attr))
+        query = cls.baked(profile, search.__code__)
+        query.add_criteria(criteria)
+        return query
 
     @classmethod
     def find_syncid(cls, syncid):
         """Look up user database entry by synchronization identifier"""
-        row = cls.query_syncid(lambda attr: attr == syncid).one_or_none()
+        query = cls.query_syncid(lambda attr: attr == bindparam('syncid'))
+        row = query(cls.db.session).params(syncid=syncid).one_or_none()
         return cls(row) if row is not None else None
 
     @classmethod
     def find_syncids(cls, syncids, invert=False):
         """Look up user database entries by synchronization identifier"""
-        query = cls.query_syncid(lambda attr: and_(
+        if invert:
+            query = cls.query_syncid(lambda attr: and_(
+                attr.isnot(None),
+                ~attr.in_(bindparam('syncids', expanding=True)),
+            ))
+        else:
+            query = cls.query_syncid(lambda attr: and_(
+                attr.isnot(None),
+                attr.in_(bindparam('syncids', expanding=True)),
+            ))
+        rows = query(cls.db.session).params(syncids=list(syncids))
+        return (cls(row) for row in rows)
+
+    @classmethod
+    def select_syncids(cls, syncids, invert=False):
+        """Construct query for primary keys by synchronization identifier
+
+        The returned query selects the primary key of the table that
+        holds the synchronization identifier column.  For a remote
+        table (accessed via an association proxy), this primary key is
+        also a foreign key referencing the entry's own primary key.
+        """
+        attr = getattr(cls.model.orm, cls.model.syncid)
+        desc = inspect(cls.model.orm).all_orm_descriptors[cls.model.syncid]
+        if desc.extension_type is ASSOCIATION_PROXY:
+            attr = attr.remote_attr
+        [key] = attr.parent.persist_selectable.primary_key.columns
+        syncids = list(syncids)
+        return select([key]).where(and_(
             attr.isnot(None),
             ~attr.in_(syncids) if invert else attr.in_(syncids),
         ))
-        return (cls(row) for row in query)
 
     @classmethod
     def create(cls):
@@ -272,9 +357,12 @@ class SqlEntry(WritableEntry, metaclass=SqlEntryMeta):
             if desc.extension_type is ASSOCIATION_PROXY:
                 # Create remote table
                 cls.db.prepare_table(attr.target_class)
+                attr = attr.remote_attr
             else:
                 # Create column
                 cls.db.prepare_column(attr)
+            # Migrate column storage type if needed
+            cls.db.prepare_uuid(attr)
 
 
 class SqlUser(SqlEntry, WritableUser):
@@ -328,53 +416,138 @@ class SqlStateModel:
 
 @dataclass
 class SqlState(State):
-    """SQL user database synchronization state"""
+    """SQL user database synchronization state
+
+    State values are cached, and modified values are written back to
+    the database using a single multi-row upsert statement only when
+    database changes are committed.  The cache is discarded at the end
+    of each database transaction (whether committed or rolled back),
+    so that values written via other connections to the same database
+    are visible within subsequent transactions.
+    """
+
+    cache: Dict[str, Optional[str]] = field(init=False, default_factory=dict)
+    """Cached values (with None representing a nonexistent key)"""
 
-    rows: Mapping[str, SqlOrm] = field(init=False, default_factory=dict)
+    dirty: Set[str] = field(init=False, default_factory=set)
+    """Keys modified since the last write back"""
 
     model: ClassVar[SqlStateModel] = None
     """SQLAlchemy synchronization state model"""
 
-    def query(self, key):
-        """Query database for synchronization state"""
-        attr = getattr(self.model.orm, self.model.key)
-        return self.db.query(self.model.orm).filter(attr == key)
+    KEY_SCHEMA: ClassVar[str] = 'schema'
+    """Schema fingerprint state key"""
+
+    @property
+    def table(self):
+        """Synchronization state table"""
+        return inspect(self.model.orm).persist_selectable
+
+    @property
+    def columns(self):
+        """Synchronization state key and value columns"""
+        columns = inspect(self.model.orm).columns
+        return columns[self.model.key], columns[self.model.value]
 
     def __getitem__(self, key):
-        if key in self.rows:
-            row = self.rows[key]
-        else:
-            row = self.rows[key] = self.query(key).one_or_none()
-        if row is None:
-            raise KeyError
-        return getattr(row, self.model.value)
+        if key not in self.cache:
+            keycol, valcol = self.columns
+            query = select([valcol]).where(keycol == key)
+            row = self.db.session.execute(query).first()
+            self.cache[key] = row[0] if row is not None else None
+        value = self.cache[key]
+        if value is None:
+            raise KeyError(key)
+        return value
 
     def __setitem__(self, key, value):
-        if key in self.rows:
-            row = self.rows[key]
-        else:
-            row = self.rows[key] = self.query(key).one_or_none()
-        if row is None:
-            row = self.rows[key] = self.model.orm(**{self.model.key: key})
-            self.db.session.add(row)
-        current = getattr(row, self.model.value)
-        if value != current:
-            setattr(row, self.model.value, value)
+        if self.cache.get(key) != value:
+            self.cache[key] = value
+            self.dirty.add(key)
 
     def __delitem__(self, key):
-        if key in self.rows:
-            self.db.session.delete(self.rows[key])
-            del self.rows[key]
-        else:
-            self.query(key).delete()
+        if self.get(key) is None:
+            raise KeyError(key)
+        self.cache[key] = None
+        self.dirty.add(key)
 
     def __iter__(self):
-        return (x[0] for x in
-                self.db.query(getattr(self.model.orm, self.model.key)))
+        self.flush()
+        keycol, _valcol = self.columns
+        return (x[0] for x in self.db.session.execute(select([keycol])))
 
     def __len__(self):
+        self.flush()
         return self.db.query(self.model.orm).count()
 
+    def expire(self):
+        """Discard cached values"""
+        self.cache.clear()
+        self.dirty.clear()
+
+    def rollback(self, _session, previous):
+        """Discard cached values after a transaction rollback"""
+        if not previous.nested:
+            self.expire()
+
+    def upsert(self, values):
+        """Insert or update values in database"""
+        table = self.table
+        keycol, valcol = self.columns
+        rows = [{keycol.name: k, valcol.name: v} for k, v in values.items()]
+        dialect = self.db.engine.dialect.name
+        if dialect == 'postgresql':
+            stmt = postgresql.insert(table).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[keycol],
+                set_={valcol.name: stmt.excluded[valcol.name]},
+            )
+        elif dialect == 'mysql':
+            stmt = mysql.insert(table).values(rows)
+            stmt = stmt.on_duplicate_key_update(
+                {valcol.name: stmt.inserted[valcol.name]}
+            )
+        elif dialect == 'sqlite' and hasattr(sqlite, 'insert'):
+            stmt = sqlite.insert(table).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[keycol],
+                set_={valcol.name: stmt.excluded[valcol.name]},
+            )
+        elif dialect == 'sqlite':
+            # Older SQLAlchemy versions have no ON CONFLICT construct
+            # for SQLite: replace the conflicting row instead
+            stmt = table.insert().prefix_with('OR REPLACE').values(rows)
+        else:
+            # Fall back to an update followed by an insert if required
+            for key, value in values.items():
+                res = self.db.session.execute(
+                    table.update().where(keycol == key).values(
+                        {valcol.name: value}
+                    )
+                )
+                if not res.rowcount:
+                    self.db.session.execute(table.insert().values(
+                        {keycol.name: key, valcol.name: value}
+                    ))
+            return
+        self.db.session.execute(stmt)
+
+    def flush(self):
+        """Write back modified values to database"""
+        if not self.dirty:
+            return
+        keycol, _valcol = self.columns
+        upserts = {k: self.cache[k] for k in self.dirty
+                   if self.cache[k] is not None}
+        deletes = [k for k in self.dirty if self.cache[k] is None]
+        if upserts:
+            self.upsert(upserts)
+        if deletes:
+            self.db.session.execute(
+                self.table.delete().where(keycol.in_(deletes))
+            )
+        self.dirty.clear()
+
     def prepare(self):
         """Prepare for use as part of an idiosync user database"""
         self.db.prepare_table(self.model.orm)
@@ -401,10 +574,16 @@ class SqlDatabase(WritableDatabase):
     Group = SqlGroup
     State = SqlState
 
+    ENTRY_ERRORS = (ValueError, DataError, IntegrityError)
+
+    MIGRATE_BATCH: ClassVar[int] = 1000
+    """Number of rows to migrate within each migration transaction"""
+
     config: SqlConfig
     engine: sqlalchemy.engine.Engine
     session: sqlalchemy.orm.Session
-    _alembic: Optional[alembic.operations.Operations]
+    _alembic: Optional['alembic.operations.Operations']
+    _inspector: Optional[sqlalchemy.engine.reflection.Inspector]
 
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
@@ -413,7 +592,9 @@ class SqlDatabase(WritableDatabase):
                                     **self.config.options)
         Session = sessionmaker(bind=self.engine)
         self.session = Session()
+        event.listen(self.session, 'after_soft_rollback', self.state.rollback)
         self._alembic = None
+        self._inspector = None
 
     def __repr__(self):
         return "%s(%r)" % (self.__class__.__name__, self.config.uri)
@@ -425,32 +606,147 @@ class SqlDatabase(WritableDatabase):
     @property
     def users(self):
         """All users"""
-        return (self.User(x) for x in self.query(self.User.model.orm))
+        query = self.User.baked('list')
+        return (self.User(x) for x in query(self.session))
 
     @property
     def groups(self):
         """All groups"""
-        return (self.Group(x) for x in self.query(self.Group.model.orm))
+        query = self.Group.baked('list')
+        return (self.Group(x) for x in query(self.session))
+
+    def execute(self, stmt):
+        """Execute bulk statement
+
+        Any pending changes are flushed before executing the
+        statement, and all loaded rows are expired afterwards since
+        they may have been modified by the statement.
+        """
+        self.session.flush()
+        result = self.session.execute(stmt)
+        self.session.expire_all()
+        return result
 
     def commit(self):
-        """Commit database changes"""
+        """Commit database changes
+
+        Schema operations and inspection are bound to the connection
+        used by the current transaction, and so must be reconstructed
+        after each commit.  Cached synchronization state is also
+        discarded, since it may be modified by other connections once
+        the transaction has ended.
+        """
+        self.state.flush()
         self.session.commit()
+        self.state.expire()
+        self._alembic = None
+        self._inspector = None
+
+    def rollback(self):
+        """Roll back uncommitted database changes
+
+        Any cached synchronization state is discarded along with the
+        transaction.
+        """
+        self.session.rollback()
+        self._alembic = None
+        self._inspector = None
+
+    @contextmanager
+    def savepoint(self):
+        """Create savepoint
+
+        Pending changes are flushed when leaving the savepoint
+        context, so that any resulting database errors are raised
+        (and rolled back) within the savepoint.
+        """
+        with self.session.begin_nested():
+            yield
+
+    def transient(self, exc):
+        """Check if exception is a transient database error"""
+        return isinstance(exc, OperationalError) or getattr(
+            exc, 'connection_invalidated', False
+        )
 
     @property
     def alembic(self):
-        """Alembic migration operations"""
+        """Alembic migration operations
+
+        Alembic is imported only when a migration is actually
+        required, since it is relatively expensive to import.
+        """
+        # pylint: disable=import-outside-toplevel
         if self._alembic is None:
+            from alembic.migration import MigrationContext
+            from alembic.operations import Operations
             conn = self.session.connection()
-            ctx = alembic.migration.MigrationContext.configure(conn)
-            self._alembic = alembic.operations.Operations(ctx)
+            ctx = MigrationContext.configure(conn)
+            self._alembic = Operations(ctx)
         return self._alembic
 
+    @property
+    def inspector(self):
+        """Schema inspector
+
+        The inspector caches reflection results, allowing all tables
+        and columns to be checked within a single inspection pass.  The
+        inspector uses the session's connection, so that reflection
+        sees (and cannot interfere with) any uncommitted schema
+        changes.
+        """
+        if self._inspector is None:
+            self._inspector = inspect(self.session.connection())
+        return self._inspector
+
+    @property
+    def fingerprint(self):
+        """Schema fingerprint
+
+        The fingerprint covers all tables and columns defined by the
+        plugin's ORM model, and so will change whenever a new version
+        of the plugin requires a different database schema.
+        """
+        digest = hashlib.sha1()
+        metadata = inspect(self.State.model.orm).persist_selectable.metadata
+        for table in metadata.sorted_tables:
+            for column in table.columns:
+                digest.update(('%s.%s %r\n' % (
+                    table.name, column.name, column.type
+                )).encode())
+        return digest.hexdigest()
+
+    def prepare(self):
+        """Prepare for use as an idiosync user database
+
+        Schema preparation requires reflection of the database schema,
+        which can be slow on large databases.  The schema fingerprint
+        is recorded in the synchronization state after a successful
+        preparation, and subsequent preparations are skipped for as
+        long as the fingerprint remains unchanged.
+        """
+        fingerprint = self.fingerprint
+        try:
+            prepared = self.state.get(self.state.KEY_SCHEMA)
+        except DBAPIError:
+            # Synchronization state table does not yet exist
+            self.session.rollback()
+            prepared = None
+        if prepared == fingerprint:
+            return
+        super().prepare()
+        self.state[self.state.KEY_SCHEMA] = fingerprint
+        self.commit()
+
     def prepare_table(self, orm):
         """Prepare table for use as part of an idiosync user database"""
         table = inspect(orm).persist_selectable
-        if table.name not in inspect(self.engine).get_table_names():
-            op = alembic.operations.ops.CreateTableOp.from_table(table)
+        if table.name not in self.inspector.get_table_names():
+            # pylint: disable=import-outside-toplevel
+            from alembic.operations.ops import CreateTableOp
+            op = CreateTableOp.from_table(table)
             self.alembic.invoke(op)
+            self._inspector = None
 
     def prepare_column(self, column):
         """Prepare column for use as part of an idiosync user database"""
@@ -460,8 +756,102 @@ class SqlDatabase(WritableDatabase):
         # error "Column object 'c' already assigned to Table 't'".
         table = column.parent.persist_selectable.tometadata(MetaData())
         column = table.columns[column.name]
-        columns = inspect(self.engine).get_columns(table.name)
+        columns = self.inspector.get_columns(table.name)
         if not any(x['name'] == column.name for x in columns):
-            op = alembic.operations.ops.AddColumnOp.from_column(column)
+            # pylint: disable=import-outside-toplevel
+            from alembic.operations.ops import AddColumnOp
+            op = AddColumnOp.from_column(column)
             column.table = None  # Workaround; see above
             self.alembic.invoke(op)
+            self._inspector = None
+
+    def prepare_uuid(self, column):
+        """Prepare UUID column for use as part of an idiosync user database
+
+        UUID columns created by older versions of idiosync may use a
+        textual CHAR(36) representation.  Such columns are migrated in
+        place to the more compact binary representation.  Existing
+        values are first copied to a temporary column in batches, with
+        each batch committed separately so that no long-lived locks
+        are held on the table.  The temporary column then replaces the
+        original column.  An interrupted migration will be resumed
+        automatically.
+
+        An existing value that cannot be parsed as a UUID is replaced
+        by a UUID derived from the invalid value, so that the entry
+        will subsequently be matched (and its synchronization
+        identifier rewritten) as though it had never been synchronized.
+        """
+        table = column.parent.persist_selectable
+        column = table.columns[column.name]
+        if not isinstance(column.type, UuidBinary):
+            return
+        columns = {x['name']: x['type'] for x in
+                   self.inspector.get_columns(table.name)}
+        if not isinstance(columns[column.name], String):
+            return
+        temp = '%s_migrate' % column.name
+        logger.info("migrating %s.%s to binary UUID storage",
+                    table.name, column.name)
+
+        # Create temporary column
+        if temp not in columns:
+            self.alembic.add_column(table.name, Column(temp, UuidBinary))
+            self.commit()
+
+        # Copy values in batches
+        keys = [Column(x.name, x.type, primary_key=True)
+                for x in table.primary_key.columns]
+        shadow = Table(table.name, MetaData(), *keys,
+                       Column(column.name, String), Column(temp, UuidBinary))
+        old = shadow.columns[column.name]
+        new = shadow.columns[temp]
+        query = select([*keys, old]).where(
+            and_(new.is_(None), old.isnot(None))
+        ).limit(self.MIGRATE_BATCH)
+        stmt = update(shadow).where(
+            and_(*(x == bindparam('key_%s' % x.name) for x in keys))
+        ).values({temp: bindparam('value')})
+        while True:
+            rows = self.session.execute(query).fetchall()
+            if not rows:
+                break
+            self.session.execute(stmt, [
+                dict({'key_%s' % x.name: row[x.name] for x in keys},
+                     value=self.parse_uuid(table, row[column.name]))
+                for row in rows
+            ])
+            self.commit()
+            logger.debug("migrated %d rows", len(rows))
+
+        # Replace original column
+        reflect = [Column(temp, UuidBinary)]
+        with self.alembic.batch_alter_table(table.name,
+                                            reflect_args=reflect) as batch:
+            batch.drop_column(column.name)
+            batch.alter_column(temp, new_column_name=column.name,
+                               existing_type=UuidBinary,
+                               nullable=column.nullable)
+        if column.unique:
+            self.alembic.create_index('ix_%s_%s' % (table.name, column.name),
+                                      table.name, [column.name], unique=True)
+        self.commit()
+
+        # Verify migration
+        columns = {x['name']: x['type'] for x in
+                   self.inspector.get_columns(table.name)}
+        if temp in columns or isinstance(columns[column.name], String):
+            raise RuntimeError("Failed to migrate %s.%s" %
+                               (table.name, column.name))
+
+    @staticmethod
+    def parse_uuid(table, value):
+        """Parse textual UUID column value"""
+        try:
+            return SyncId.from_str(value)
+        except ValueError:
+            if isinstance(value, bytes):
+                value = value.decode(errors='replace')
+            logger.warning("replacing invalid UUID %r in %s", value,
+                           table.name)
+            return uuid.uuid5(NAMESPACE_SQL, value)
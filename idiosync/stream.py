@@ -0,0 +1,212 @@
+"""User database event streams"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import logging
+import queue
+import threading
+import time
+from typing import Any, ClassVar, Dict, Iterable, Iterator, List, Optional
+from .base import Entry, SyncCookie, SyncId, DeletedSyncIds
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StreamReader:
+    """A background reader for a blocking event stream
+
+    Events are read from the underlying stream by a dedicated thread
+    into a bounded queue, so that the consumer may wait for the next
+    event with a timeout.  Any exception raised by the underlying
+    stream is re-raised to the consumer.
+    """
+
+    events: Iterable[Any]
+    """Underlying event stream"""
+
+    maxsize: int = 1024
+    """Maximum number of events to read ahead"""
+
+    buffer: queue.Queue = field(init=False, repr=False)
+    """Events read ahead"""
+
+    stopped: threading.Event = field(init=False, repr=False,
+                                     default_factory=threading.Event)
+    """Consumer has stopped reading"""
+
+    END: ClassVar[object] = object()
+    """End of stream marker"""
+
+    timeout: ClassVar[float] = 1
+    """Interval between checks for a stopped consumer"""
+
+    def __post_init__(self) -> None:
+        self.buffer = queue.Queue(self.maxsize)
+        thread = threading.Thread(target=self.read, daemon=True,
+                                  name='idiosync-reader')
+        thread.start()
+
+    def put(self, item):
+        """Add item to queue (unless the consumer has stopped)"""
+        while not self.stopped.is_set():
+            try:
+                self.buffer.put(item, timeout=self.timeout)
+                return
+            except queue.Full:
+                pass
+
+    def read(self):
+        """Read all events from the underlying stream"""
+        try:
+            for event in self.events:
+                self.put((event, None))
+                if self.stopped.is_set():
+                    return
+            self.put((self.END, None))
+        except Exception as exc:  # pylint: disable=broad-except
+            self.put((self.END, exc))
+
+    def get(self, timeout=None):
+        """Get next event
+
+        Raises :class:`queue.Empty` if no event is available within
+        the timeout, and :class:`StopIteration` at the end of the
+        stream.
+        """
+        event, exc = self.buffer.get(timeout=timeout)
+        if exc is not None:
+            raise exc
+        if event is self.END:
+            raise StopIteration
+        return event
+
+    def close(self):
+        """Stop reading"""
+        self.stopped.set()
+
+
+@dataclass
+class Coalescer:
+    """A coalescing buffer for a user database event stream
+
+    Modified entries and deleted synchronization identifiers are
+    buffered for up to a fixed latency budget, keeping only the most
+    recent version of each entry.  A deletion overrides any earlier
+    modification of the same entry (and vice versa).
+
+    Synchronization cookies are held back until the buffer is
+    flushed, so that a cookie is never seen before all of the events
+    that preceded it.  Any other event (such as the completion of a
+    refresh) flushes the buffer and is passed through unchanged.
+    """
+
+    latency: float
+    """Maximum time (in seconds) for which an event may be buffered"""
+
+    maxsize: int = 1024
+    """Maximum number of buffered entries"""
+
+    pending: Dict[SyncId, Optional[Entry]] = field(
+        init=False, repr=False, default_factory=OrderedDict
+    )
+    """Buffered entries (or ``None`` for deleted entries)"""
+
+    cookie: Optional[SyncCookie] = field(init=False, repr=False,
+                                         default=None)
+    """Held synchronization cookie"""
+
+    deadline: Optional[float] = field(init=False, repr=False, default=None)
+    """Time by which the buffer must be flushed"""
+
+    def add(self, event):
+        """Add event to buffer
+
+        Returns ``False`` if the event cannot be buffered.
+        """
+        if isinstance(event, Entry):
+            syncid = SyncId.from_uuid(event.uuid)
+            self.pending.pop(syncid, None)
+            self.pending[syncid] = event
+        elif isinstance(event, DeletedSyncIds):
+            for syncid in event:
+                self.pending.pop(syncid, None)
+                self.pending[syncid] = None
+        elif isinstance(event, SyncCookie):
+            self.cookie = event
+        else:
+            return False
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.latency
+        return True
+
+    @property
+    def full(self):
+        """Buffer is full"""
+        return len(self.pending) >= self.maxsize
+
+    @property
+    def remaining(self):
+        """Time remaining until the buffer must be flushed"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0)
+
+    def flush(self):
+        """Flush buffered events
+
+        Buffered entries and deletions are emitted in the order in
+        which they were (most recently) received, with consecutive
+        deletions combined into a single event.  A deleted entry is
+        therefore removed before any subsequently created entry that
+        might reuse its name.
+        """
+        if self.pending:
+            logger.debug("Flushing %d coalesced entries", len(self.pending))
+        deleted: List[SyncId] = []
+        for syncid, entry in self.pending.items():
+            if entry is None:
+                deleted.append(syncid)
+                continue
+            if deleted:
+                yield DeletedSyncIds(deleted)
+                deleted = []
+            yield entry
+        if deleted:
+            yield DeletedSyncIds(deleted)
+        if self.cookie is not None:
+            yield self.cookie
+        self.pending = OrderedDict()
+        self.cookie = None
+        self.deadline = None
+
+    def coalesce(self, events: Iterable[Any]) -> Iterator[Any]:
+        """Coalesce events"""
+        reader = StreamReader(events)
+        try:
+            while True:
+                try:
+                    event = reader.get(timeout=self.remaining)
+                except queue.Empty:
+                    yield from self.flush()
+                    continue
+                except StopIteration:
+                    break
+                except Exception:
+                    # Flush events preceding the failure
+                    yield from self.flush()
+                    raise
+                if not self.add(event):
+                    yield from self.flush()
+                    yield event
+                elif self.full:
+                    yield from self.flush()
+            yield from self.flush()
+        finally:
+            reader.close()
+
+
+def coalesce(events: Iterable[Any], latency: float,
+             **kwargs: Any) -> Iterator[Any]:
+    """Coalesce repeated modifications within an event stream"""
+    return Coalescer(latency, **kwargs).coalesce(events)
@@ -1,10 +1,21 @@
 """User database synchronization"""
 
-from dataclasses import dataclass, field
+import asyncio
+from collections import abc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+import functools
+import json
 import logging
-from typing import Callable, ClassVar, List, Type
+import time
+from typing import (Callable, ClassVar, Dict, List, Mapping, Optional, Set,
+                    Tuple, Type)
 from .base import (Attribute, Entry, User, Database, SyncCookie, SyncId,
-                   SyncIds, UnchangedSyncIds, DeletedSyncIds, RefreshComplete)
+                   SyncIds, UnchangedSyncIds, DeletedSyncIds, RefreshComplete,
+                   aiterate)
+from .batch import BatchController
+from .limit import RateLimits
+from .stream import Coalescer
 
 logger = logging.getLogger(__name__)
 
@@ -121,13 +132,246 @@ class GroupSynchronizer(EntrySynchronizer):
     attrs = ['commonName', 'description']
 
 
+@dataclass
+class DeadLetter:
+    """A source database entry that could not be synchronized"""
+
+    key: str
+    """Canonical lookup key"""
+
+    user: bool
+    """Entry is a user (rather than a group)"""
+
+    strict: bool = False
+    """Identify matching entries only by permanent UUID"""
+
+    attempts: int = 1
+    """Number of failed attempts"""
+
+    retry: float = 0
+    """Time (in seconds since the epoch) at which to retry"""
+
+    error: str = ''
+    """Most recent error"""
+
+    def __str__(self):
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def parse(cls, value):
+        """Parse dead letter"""
+        return cls(**json.loads(value))
+
+
+DeadLetter_ = DeadLetter
+
+
+@dataclass(eq=False)
+class DeadLetters(abc.MutableMapping):
+    """Dead letters for entries that could not be synchronized
+
+    Dead letters are held in memory and persisted within the
+    destination database state.  The mapping interface operates only
+    upon the dead letters held in memory: use :meth:`record` and
+    :meth:`discard` to persist changes.
+    """
+
+    db: Database
+    """Destination database"""
+
+    letters: Dict[SyncId, DeadLetter_] = field(default_factory=dict,
+                                               repr=False)
+    """Dead letters (by synchronization identifier)"""
+
+    DeadLetter: ClassVar[Type[DeadLetter_]] = DeadLetter
+
+    RETRY_DELAY: ClassVar[float] = 60
+    """Initial delay (in seconds) before retrying a failed entry"""
+
+    RETRY_MAX: ClassVar[float] = 3600
+    """Maximum delay (in seconds) before retrying a failed entry"""
+
+    ERROR_LEN: ClassVar[int] = 1024
+    """Maximum length of a recorded error"""
+
+    def __getitem__(self, key):
+        return self.letters[key]
+
+    def __setitem__(self, key, value):
+        self.letters[key] = value
+
+    def __delitem__(self, key):
+        del self.letters[key]
+
+    def __iter__(self):
+        return iter(self.letters)
+
+    def __len__(self):
+        return len(self.letters)
+
+    def load(self):
+        """Load dead letters from destination database state"""
+        self.letters = {k: self.DeadLetter.parse(v) for k, v in
+                        self.db.state.deadletters.items()}
+
+    def record(self, src, strict, exc):
+        """Record entry that could not be synchronized"""
+        syncid = SyncId.from_uuid(src.uuid)
+        previous = self.letters.get(syncid)
+        attempts = previous.attempts + 1 if previous is not None else 1
+        delay = min(self.RETRY_DELAY * 2 ** (attempts - 1), self.RETRY_MAX)
+        letter = self.DeadLetter(
+            key=src.key, user=isinstance(src, User), strict=strict,
+            attempts=attempts, retry=(time.time() + delay),
+            error=str(exc)[:self.ERROR_LEN],
+        )
+        logger.error("failed to synchronize %s (attempt %d, retry in %ds): "
+                     "%s", src, attempts, delay, exc)
+        self.letters[syncid] = letter
+        self.db.state[self.db.state.deadletter_key(syncid)] = str(letter)
+
+    def discard(self, syncid):
+        """Discard any dead letter for an entry
+
+        Returns True if a dead letter was discarded.
+        """
+        if self.letters.pop(syncid, None) is None:
+            return False
+        del self.db.state[self.db.state.deadletter_key(syncid)]
+        return True
+
+    def due(self):
+        """Identify dead-lettered entries that are due for retry"""
+        now = time.time()
+        return [k for k, v in self.letters.items() if v.retry <= now]
+
+
+@dataclass
+class EntryQueue:
+    """A queue of source database entries awaiting application
+
+    Entries are applied in chunks, each within a savepoint.  If any
+    entry within a chunk fails with an error attributable to an
+    individual entry (see
+    :attr:`~idiosync.base.WritableDatabase.ENTRY_ERRORS`), then the
+    savepoint is rolled back and the chunk is retried in two halves
+    (recursively) until the failing entries are isolated.  Any other
+    error is propagated.
+
+    The number of entries applied (and the time spent applying them)
+    since the last commit is tracked for use in adaptive batching.
+    """
+
+    syncer: 'Synchronizer' = field(repr=False)
+    """Owning synchronizer"""
+
+    isolate: bool = True
+    """Isolate failing entries rather than aborting synchronization"""
+
+    chunk: int = 100
+    """Maximum number of entries applied within each savepoint"""
+
+    queued: List[Tuple[Entry, bool]] = field(init=False, repr=False,
+                                             default_factory=list)
+    """Entries (and strictness) awaiting application"""
+
+    pending: int = field(init=False, default=0)
+    """Number of entries queued since the last commit"""
+
+    started: float = field(init=False, repr=False, default=0)
+    """Time of the last commit"""
+
+    elapsed: float = field(init=False, repr=False, default=0)
+    """Time spent applying entries since the last commit"""
+
+    def append(self, src, strict=False):
+        """Queue entry for application
+
+        Returns True if a full chunk of entries is awaiting
+        application.
+        """
+        self.queued.append((src, strict))
+        self.pending += 1
+        return len(self.queued) >= self.chunk
+
+    def flush(self):
+        """Apply queued entries"""
+        entries, self.queued = self.queued, []
+        if entries:
+            start = time.monotonic()
+            self.apply(entries)
+            self.elapsed += time.monotonic() - start
+
+    def committed(self):
+        """Restart tracking after a commit"""
+        self.pending = 0
+        self.started = time.monotonic()
+        self.elapsed = 0
+
+    def reset(self):
+        """Discard queued entries and restart tracking"""
+        self.queued = []
+        self.committed()
+
+    def apply(self, entries):
+        """Apply entries within a savepoint, isolating any failures"""
+        syncer = self.syncer
+        dst = syncer.dst
+        if not self.isolate:
+            for src, strict in entries:
+                syncer.entry(src, strict=strict)
+            return
+        try:
+            with dst.savepoint():
+                for src, strict in entries:
+                    syncer.entry(src, strict=strict)
+        except dst.ENTRY_ERRORS as exc:
+            if dst.transient(exc):
+                raise
+            if len(entries) == 1:
+                src, strict = entries[0]
+                syncer.deadletter(src, strict, exc)
+                return
+            logger.warning("isolating failure within %d entries",
+                           len(entries))
+            half = len(entries) // 2
+            self.apply(entries[:half])
+            self.apply(entries[half:])
+        else:
+            for src, _strict in entries:
+                syncer.recovered(src)
+
+
 UserSynchronizer_ = UserSynchronizer
 GroupSynchronizer_ = GroupSynchronizer
+BatchController_ = BatchController
+DeadLetters_ = DeadLetters
+EntryQueue_ = EntryQueue
 
 
 @dataclass
-class Synchronizer:
-    """A user database synchronizer"""
+class Synchronizer:  # pylint: disable=too-many-instance-attributes
+    """A user database synchronizer
+
+    Changes made during a bulk refresh are normally committed only
+    once the refresh is complete.  When resuming from a stored cookie,
+    security-relevant changes (disabled entries and deletions) are
+    given priority: they are committed immediately, along with any
+    refresh work batched so far, so that revoking access does not
+    have to wait for a long refresh to finish.  Synchronization
+    cookies received during a refresh are held back until the refresh
+    is complete, so that a partially committed refresh is never
+    mistaken for a completed one.
+
+    A :class:`~idiosync.batch.BatchController` may be used to commit
+    refresh work in batches, with the batch size and commit interval
+    adapted to the observed destination commit latency.
+
+    Entries are applied within savepoints via an :class:`EntryQueue`.
+    A failing entry is isolated and recorded as a :class:`DeadLetter`
+    within the destination database state, to be retried with
+    exponential backoff, and synchronization continues.
+    """
 
     src: Database
     """Source database"""
@@ -141,18 +385,58 @@ class Synchronizer:
     group: GroupSynchronizer_ = field(init=False, repr=False)
     """Group synchronizer"""
 
+    prepared: bool = False
+    """Destination database has already been prepared"""
+
+    priority: bool = True
+    """Commit security-relevant changes immediately during a refresh
+
+    An urgent commit uses the same destination database transaction
+    as the refresh, and so also commits (i.e. flushes) any refresh
+    work applied so far.  The synchronization cookie is held back and
+    unmentioned entries are not deleted until the refresh is
+    complete, and so a refresh interrupted after an urgent commit is
+    never mistaken for a completed one: it is repeated in full from
+    the previously stored cookie.
+    """
+
+    syncids: Optional[Set[SyncId]] = field(init=False, repr=False,
+                                           default=None)
+    """Synchronization identifiers observed during a bulk refresh"""
+
+    cookie: Optional[SyncCookie] = field(init=False, repr=False,
+                                         default=None)
+    """Synchronization cookie held until a bulk refresh is complete"""
+
+    batch: Optional[BatchController_] = field(default=None, repr=False)
+    """Adaptive refresh batch controller (if any)"""
+
+    limits: Optional[RateLimits] = field(default=None, repr=False)
+    """Destination database rate limits (if any)"""
+
+    entries: EntryQueue_ = field(init=False, repr=False)
+    """Entries awaiting application"""
+
+    deadletters: DeadLetters_ = field(init=False, repr=False)
+    """Dead letters for entries that could not be synchronized"""
+
     UserSynchronizer: ClassVar[Type[UserSynchronizer_]] = UserSynchronizer
     GroupSynchronizer: ClassVar[Type[GroupSynchronizer_]] = GroupSynchronizer
+    BatchController: ClassVar[Type[BatchController_]] = BatchController
+    DeadLetters: ClassVar[Type[DeadLetters_]] = DeadLetters
+    EntryQueue: ClassVar[Type[EntryQueue_]] = EntryQueue
 
     def __post_init__(self) -> None:
         self.user = self.UserSynchronizer(self.src.User, self.dst.User)
         self.group = self.GroupSynchronizer(self.src.Group, self.dst.Group)
+        self.entries = self.EntryQueue(self)
+        self.deadletters = self.DeadLetters(self.dst)
 
     def entry(self, src, syncids=None, strict=False):
         """Synchronize a single database entry"""
 
         # Construct synchronization identifier
-        syncid = SyncId(uuid=src.uuid)
+        syncid = SyncId.from_uuid(src.uuid)
 
         # Add to list of observed synchronization identifiers
         if syncids is not None:
@@ -181,72 +465,452 @@ class Synchronizer:
 
     def delete(self, syncids, invert=False, delete=False):
         """Delete (or disable) multiple database entries"""
-        for dst in self.dst.find_syncids(syncids, invert=invert):
-            if delete:
+        if delete:
+            for dst in self.dst.find_syncids(syncids, invert=invert):
                 logger.info("deleting entry %s", dst)
                 dst.delete()
-            elif dst.enabled:
-                logger.info("disabling entry %s", dst)
-                dst.enabled = False
+        else:
+            logger.info("disabling %s entries",
+                        "unmentioned" if invert else "deleted")
+            self.dst.enable_syncids(syncids, enabled=False, invert=invert)
 
-    def sync(self, persist=True, strict=False, delete=False):
-        """Synchronize database"""
+    def start(self, batch=None):
+        """Start synchronization
+
+        The destination database is prepared (if not already prepared)
+        and the synchronization cookie from which to resume watching
+        the source database is returned.
+
+        If a target commit latency (in seconds) is specified, then
+        refresh work will be committed in adaptively sized batches.
+        The batch controller settings (such as the batch size bounds)
+        may alternatively be specified as a mapping.
+        """
+
+        # Construct batch controller, if applicable
+        if batch:
+            if not isinstance(batch, Mapping):
+                batch = {'target': batch}
+            self.batch = self.BatchController(**batch)
 
         # Prepare destination database
-        self.dst.prepare()
+        if not self.prepared:
+            self.dst.prepare()
+            self.prepared = True
+
+        # Load dead letters
+        self.deadletters.load()
+        if self.deadletters:
+            logger.warning("%d entries awaiting retry", len(self.deadletters))
+
+        # Start with an empty list of observed synchronization identifiers
+        self.syncids = set()
+        self.cookie = None
+        self.entries.reset()
+        return self.dst.state.cookie
+
+    def deadletter(self, src, strict, exc):
+        """Record entry that could not be synchronized"""
+        self.deadletters.record(src, strict, exc)
+
+    def recovered(self, src):
+        """Clear any dead letter for a successfully synchronized entry"""
+        if self.deadletters.discard(SyncId.from_uuid(src.uuid)):
+            logger.info("recovered failed entry %s", src)
+
+    def abandon(self, syncid):
+        """Abandon a failed entry that is no longer present"""
+        self.deadletters.discard(syncid)
+
+    def resync(self, src, strict):
+        """Retry synchronization of a failed entry"""
+        self.entries.apply([(src, strict)])
+
+    def retry(self):
+        """Retry dead-lettered entries that are due for retry"""
+        due = self.deadletters.due()
+        for syncid in due:
+            letter = self.deadletters[syncid]
+            find = self.src.user if letter.user else self.src.group
+            src = find(letter.key)
+            if src is None or SyncId.from_uuid(src.uuid) != syncid:
+                logger.warning("abandoning failed entry %s: no longer "
+                               "present", letter.key)
+                self.abandon(syncid)
+                continue
+            logger.info("retrying failed entry %s", src)
+            self.resync(src, letter.strict)
+        if due:
+            self.commit()
+
+    def commit(self):
+        """Commit destination database changes"""
+        entries = self.entries
+        entries.flush()
+        if self.limits is not None:
+            self.limits.commit()
+        start = time.monotonic()
+        self.dst.commit()
+        latency = time.monotonic() - start
+        if self.batch is not None and entries.pending:
+            self.batch.record(entries.pending, entries.elapsed, latency)
+        entries.committed()
+
+    @property
+    def metrics(self):
+        """Current synchronization metrics"""
+        metrics = {
+            'pending': self.entries.pending,
+            'deadletters': len(self.deadletters),
+        }
+        if self.batch is not None:
+            metrics.update(asdict(self.batch.metrics))
+        return metrics
+
+    def urgent(self, src):
+        """Check if source database watch event is security-relevant
+
+        Only changes are given priority.  A full refresh (i.e. one that
+        is not resuming from a stored cookie) describes the existing
+        content of the source database, and any disabled entries
+        within it are not treated as urgent.
+        """
+        return self.priority and (
+            isinstance(src, DeletedSyncIds) or
+            (isinstance(src, Entry) and not src.enabled)
+        ) and self.dst.state.cookie is not None
+
+    def enqueue(self, src, strict=False):
+        """Queue a single source database entry"""
+        entries = self.entries
+
+        # Add to list of observed synchronization identifiers
+        if self.syncids is not None:
+            self.syncids |= {SyncId.from_uuid(src.uuid)}
+
+        # Queue entry for synchronization
+        if self.limits is not None:
+            self.limits.write()
+        full = entries.append(src, strict)
+
+        # Commit changes unless this is part of a bulk refresh
+        if self.syncids is None or self.urgent(src):
+            self.commit()
+        elif (self.batch is not None and
+              self.batch.due(entries.pending, entries.started)):
+            logger.info("committing batch of %d entries", entries.pending)
+            self.commit()
+        elif full:
+            entries.flush()
+
+    def deleted(self, syncids, delete=False):
+        """Delete (or disable) deleted synchronization identifiers"""
+
+        # Delete synchronization identifiers
+        if self.limits is not None:
+            self.limits.write()
+        self.delete(syncids, invert=False, delete=delete)
+
+        # Commit changes unless this is part of a bulk refresh
+        if self.syncids is None or self.urgent(syncids):
+            self.commit()
+
+    def complete(self, src, delete=False):
+        """Complete a bulk refresh"""
+
+        # Delete unmentioned synchronization identifiers if applicable
+        if self.syncids is not None and src.autodelete:
+            logger.info("deleting unmentioned entries")
+            self.delete(SyncIds(self.syncids), invert=True, delete=delete)
+
+        # Clear list of synchronization identifiers
+        self.syncids = None
+
+        # Store any held cookie
+        if self.cookie is not None:
+            self.dst.state.cookie = self.cookie
+            self.cookie = None
+
+        # Commit changes
+        logger.info("refresh complete")
+        self.commit()
+
+        # Retry any failed entries that are due
+        self.retry()
+
+    def advance(self, cookie):
+        """Update stored cookie (or hold until refresh is complete)"""
+        if self.syncids is None:
+            self.dst.state.cookie = cookie
+            self.commit()
+            self.retry()
+        else:
+            self.cookie = cookie
+
+    def apply(self, src, strict=False, delete=False):
+        """Apply a single source database watch event"""
+
+        if isinstance(src, Entry):
+            self.enqueue(src, strict=strict)
+            return
+
+        # Apply any queued entries before any other event
+        self.entries.flush()
+
+        if isinstance(src, UnchangedSyncIds):
+
+            # Add to list of observed synchronization identifiers
+            if self.syncids is not None:
+                self.syncids |= set(src)
+
+        elif isinstance(src, DeletedSyncIds):
+            self.deleted(src, delete=delete)
+
+        elif isinstance(src, RefreshComplete):
+            self.complete(src, delete=delete)
+
+        elif isinstance(src, SyncCookie):
+            self.advance(src)
+
+        else:
+
+            raise TypeError(src)
+
+    def watch(self, cookie=None, persist=True, coalesce=None):
+        """Watch source database
+
+        If a coalescing latency budget (in seconds) is specified, then
+        repeated modifications to the same entry within the latency
+        budget are coalesced into a single modification.
+        """
+        events = self.src.watch(cookie=cookie, persist=persist)
+        if coalesce:
+            events = Coalescer(coalesce).coalesce(events)
+        return events
+
+    def awatch(self, cookie=None, persist=True, coalesce=None):
+        """Watch source database asynchronously"""
+        if coalesce:
+            return aiterate(self.watch(cookie=cookie, persist=persist,
+                                       coalesce=coalesce))
+        return self.src.awatch(cookie=cookie, persist=persist)
+
+    def sync(self, persist=True, strict=False, delete=False, coalesce=None,
+             batch=None):
+        """Synchronize database"""
 
         # Refresh database and watch for changes
-        syncids = set()
-        for src in self.src.watch(cookie=self.dst.state.cookie,
-                                  persist=persist):
-            if isinstance(src, Entry):
+        cookie = self.start(batch=batch)
+        for src in self.watch(cookie=cookie, persist=persist,
+                              coalesce=coalesce):
+            self.apply(src, strict=strict, delete=delete)
 
-                # Synchronize entry
-                self.entry(src, syncids=syncids, strict=strict)
 
-                # Commit changes unless this is part of a bulk refresh
-                if not syncids:
-                    self.dst.commit()
+@dataclass
+class AsyncSynchronizer(Synchronizer):
+    """An asynchronous user database synchronizer
 
-            elif isinstance(src, UnchangedSyncIds):
+    Source database events are received asynchronously via the event
+    loop.  Destination database work (which is blocking) is carried
+    out in order by a single dedicated worker thread, leaving the
+    event loop free to service other watches or timers.
+    """
 
-                # Add to list of observed synchronization identifiers
-                if syncids is not None:
-                    syncids |= set(src)
+    executor: ThreadPoolExecutor = field(init=False, repr=False)
+    """Destination database worker thread"""
 
-            elif isinstance(src, DeletedSyncIds):
+    def __post_init__(self) -> None:
+        super().__post_init__()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    async def run(self, func, *args, **kwargs):
+        """Run blocking destination database work"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
 
-                # Delete synchronization identifiers
-                self.delete(src, invert=False, delete=delete)
+    async def async_sync(self, persist=True, strict=False, delete=False,
+                         coalesce=None, batch=None):
+        """Synchronize database asynchronously"""
 
-            elif isinstance(src, RefreshComplete):
+        # Refresh database and watch for changes
+        cookie = await self.run(self.start, batch=batch)
+        async for src in self.awatch(cookie=cookie, persist=persist,
+                                     coalesce=coalesce):
+            await self.run(self.apply, src, strict=strict, delete=delete)
 
-                # Delete unmentioned synchronization identifiers if applicable
-                if syncids is not None and src.autodelete:
-                    logger.info("deleting unmentioned entries")
-                    self.delete(SyncIds(syncids), invert=True, delete=delete)
+    def close(self):
+        """Shut down destination database worker thread"""
+        self.executor.shutdown(wait=False)
 
-                # Clear list of synchronization identifiers
-                syncids = None
 
-                # Commit changes
-                logger.info("refresh complete")
-                self.dst.commit()
+AsyncSynchronizer_ = AsyncSynchronizer
 
-            elif isinstance(src, SyncCookie):
 
-                # Update stored cookie
-                self.dst.state.cookie = src
+@dataclass
+class FanoutSynchronizer:
+    """A user database synchronizer with multiple destinations
 
-                # Commit changes unless this is part of a bulk refresh
-                if not syncids:
-                    self.dst.commit()
+    Each destination database retains its own synchronization cookie.
+    Destinations with the same cookie (which is the normal case) share
+    a single source database watch, and each distinct cookie (e.g. for
+    a newly added destination) gets a watch of its own.
+
+    Each destination has its own queue of pending events and its own
+    worker thread, so that a slow destination does not stall the
+    others.  The queues are bounded: a destination that falls too far
+    behind is detached from the shared watch and, once it has applied
+    all of its queued events, catches up via a watch of its own
+    starting from its own stored cookie.
+
+    A failing destination does not stop the others.  The first failure
+    is raised once all destinations have finished.
+    """
+
+    src: Database
+    """Source database"""
 
-            else:
+    dsts: List[Database]
+    """Destination databases"""
 
-                raise TypeError(src)
+    syncers: List[AsyncSynchronizer_] = field(init=False, repr=False)
+    """Per-destination synchronizers"""
+
+    limits: Optional[List[Optional[RateLimits]]] = field(default=None,
+                                                         repr=False)
+    """Per-destination rate limits (if any)"""
+
+    options: Optional[List[Dict[str, bool]]] = field(default=None,
+                                                     repr=False)
+    """Per-destination ``strict`` and ``delete`` options (if any)
+
+    These override the corresponding options passed to
+    :meth:`async_sync` for individual destinations.
+    """
+
+    AsyncSynchronizer: ClassVar[Type[AsyncSynchronizer_]] = AsyncSynchronizer
+
+    maxsize: ClassVar[int] = 1024
+    """Maximum number of pending events for each destination"""
+
+    def __post_init__(self) -> None:
+        limits = self.limits or [None] * len(self.dsts)
+        self.syncers = [self.AsyncSynchronizer(self.src, dst, limits=limit)
+                        for dst, limit in zip(self.dsts, limits)]
+
+    async def fanout(self, cookie, indexes, *, persist=True, strict=False,
+                     delete=False, coalesce=None, batch=None):
+        """Distribute events from a single source watch to destinations
+
+        Returns a list of any exceptions raised.
+        """
+        # pylint: disable=too-many-arguments,too-many-locals
+        syncers = [self.syncers[x] for x in indexes]
+        options = [{'strict': strict, 'delete': delete,
+                    **(self.options[x] if self.options else {})}
+                   for x in indexes]
+        queues = [asyncio.Queue(self.maxsize) for _ in syncers]
+        attached = [True] * len(syncers)
+
+        def detach(index, reason):
+            logger.warning("detaching %s from shared watch: %s",
+                           syncers[index].dst, reason)
+            attached[index] = False
+
+        async def produce():
+            try:
+                async for src in syncers[0].awatch(cookie=cookie,
+                                                   persist=persist,
+                                                   coalesce=coalesce):
+                    for index, queue in enumerate(queues):
+                        if not attached[index]:
+                            continue
+                        if queue.full():
+                            detach(index, "too far behind")
+                            continue
+                        queue.put_nowait(src)
+                    if not any(attached):
+                        break
+            finally:
+                for index, queue in enumerate(queues):
+                    if not attached[index]:
+                        continue
+                    if queue.full():
+                        detach(index, "too far behind")
+                        continue
+                    queue.put_nowait(None)
+
+        async def consume(index):
+            syncer = syncers[index]
+            queue = queues[index]
+            try:
+                while attached[index] or not queue.empty():
+                    src = await queue.get()
+                    if src is None:
+                        return
+                    await syncer.run(syncer.apply, src, **options[index])
+            except Exception as exc:
+                logger.error("synchronization to %s failed: %s",
+                             syncer.dst, exc)
+                attached[index] = False
+                raise
+            # Catch up independently from this destination's own cookie
+            await syncer.async_sync(persist=persist, coalesce=coalesce,
+                                    batch=batch, **options[index])
+
+        results = await asyncio.gather(
+            produce(), *(consume(x) for x in range(len(syncers))),
+            return_exceptions=True,
+        )
+        return [x for x in results if isinstance(x, BaseException)]
+
+    async def async_sync(self, persist=True, strict=False, delete=False,
+                         coalesce=None, batch=None):
+        """Synchronize databases asynchronously"""
+
+        # Prepare destination databases and group them by cookie
+        cookies = await asyncio.gather(*(x.run(x.start, batch=batch)
+                                         for x in self.syncers))
+        groups: Dict[Optional[str], Tuple[Optional[SyncCookie], List[int]]]
+        groups = {}
+        for index, cookie in enumerate(cookies):
+            key = str(cookie) if cookie is not None else None
+            groups.setdefault(key, (cookie, []))[1].append(index)
+        if len(groups) > 1:
+            logger.info("destination cookies differ: using %d watches",
+                        len(groups))
+
+        # Distribute source events to all destinations
+        results = await asyncio.gather(*(
+            self.fanout(cookie, indexes, persist=persist, strict=strict,
+                        delete=delete, coalesce=coalesce, batch=batch)
+            for cookie, indexes in groups.values()
+        ))
+        errors = [x for result in results for x in result]
+        if errors:
+            raise errors[0]
+
+    def sync(self, **kwargs):
+        """Synchronize databases"""
+        asyncio.run(self.async_sync(**kwargs))
+
+    @property
+    def metrics(self):
+        """Current synchronization metrics for each destination"""
+        return {repr(x.dst): x.metrics for x in self.syncers}
+
+    def close(self):
+        """Shut down destination database worker threads"""
+        for syncer in self.syncers:
+            syncer.close()
 
 
 def synchronize(src, dst, **kwargs):
     """Synchronize source database to destination database"""
     Synchronizer(src, dst).sync(**kwargs)
+
+
+async def async_synchronize(src, dst, **kwargs):
+    """Synchronize source database to destination database asynchronously"""
+    await AsyncSynchronizer(src, dst).async_sync(**kwargs)
@@ -1,8 +1,8 @@
 """Workarounds for bugs in pyldap's syncrepl module"""
 
-from uuid import UUID
 import ldap.syncrepl
 from pyasn1.codec.ber import decoder
+from .base import SyncId
 
 try:
     SyncInfoValue = ldap.syncrepl.SyncInfoValue
@@ -41,8 +41,8 @@ class SyncInfoMessage:
             uuids = []
             ids = comp.getComponentByName('syncUUIDs')
             for i in range(len(ids)):
-                uuid = UUID(bytes=bytes(ids.getComponentByPosition(i)))
-                uuids.append(str(uuid))
+                raw = bytes(ids.getComponentByPosition(i))
+                uuids.append(SyncId.from_bytes(raw))
             val['syncUUIDs'] = uuids
             val['refreshDeletes'] = bool(
                 comp.getComponentByName('refreshDeletes')
@@ -48,6 +48,11 @@ class ReplayTestCase(TestCase):
         with self.resource_textio(ldif) as fh:
             yield from LdapResult.readall(fh)
 
+    async def ldap_awatch_search(self, ldif):
+        """Asynchronously read all LDAP trace events from LDIF file"""
+        for res in self.ldap_watch_search(ldif):
+            yield res
+
     def ldap_watch(self, entries):
         """Record all LDAP entries"""
         def watch_and_record(*args, watch=self.src.watch, **kwargs):
@@ -62,8 +67,13 @@ class ReplayTestCase(TestCase):
         entries = ReplayedEntries()
         with patch.object(self.src, 'watch', autospec=True,
                           side_effect=self.ldap_watch(entries)):
+            # Each search replays the LDIF file from the beginning
             with patch.object(self.src, '_watch_search', autospec=True,
-                              return_value=self.ldap_watch_search(ldif)):
+                              side_effect=lambda *args, **kwargs:
+                              self.ldap_watch_search(ldif)), \
+                 patch.object(self.src, '_awatch_search', autospec=True,
+                              side_effect=lambda *args, **kwargs:
+                              self.ldap_awatch_search(ldif)):
                 yield entries
 
     def ldap_replay(self, ldif):
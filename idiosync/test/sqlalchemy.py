@@ -1,6 +1,22 @@
 """SQLAlchemy test functionality"""
 
 from contextlib import closing
+import math
+import os
+import pickle
+import sqlite3
+import tempfile
+from unittest.mock import MagicMock, patch
+from sqlalchemy import (inspect, insert, select, Column, MetaData, String,
+                        Table)
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.associationproxy import ASSOCIATION_PROXY
+from sqlalchemy.pool import StaticPool
+from ..base import SyncId
+from ..config import DatabaseConfig
+from ..shard import (ShardedSynchronizer, ShardSource, ShardUser,
+                     ShardWorkerSynchronizer)
+from ..sync import UserSynchronizer
 from .sync import SynchronizerTestCase
 
 
@@ -13,7 +29,13 @@ class SqlTestCase(SynchronizerTestCase):
         cls.schema = cls.resource_text('%s.sql' % cls.plugin)
 
     def plugin_database(self, **kwargs):
-        dst = super().plugin_database(uri='sqlite://', **kwargs)
+        # Share a single in-memory database connection between threads
+        options = {
+            'poolclass': StaticPool,
+            'connect_args': {'check_same_thread': False},
+        }
+        dst = super().plugin_database(uri='sqlite://', options=options,
+                                      **kwargs)
         with closing(dst.engine.raw_connection()) as conn:
             conn.cursor().executescript(self.schema)
         return dst
@@ -21,3 +43,260 @@ class SqlTestCase(SynchronizerTestCase):
     def tearDown(self):
         self.dst.engine.dispose()
         super().tearDown()
+
+    def test_prepare_fingerprint(self):
+        """Test skipping schema preparation for an unchanged schema"""
+        state = self.dst.state
+        self.assertEqual(state[state.KEY_SCHEMA], self.dst.fingerprint)
+        with patch.object(self.dst, 'prepare_table') as prepare_table:
+            self.dst.prepare()
+        prepare_table.assert_not_called()
+
+    def test_state(self):
+        """Test synchronization state mapping"""
+        state = self.dst.state
+        state['test'] = 'value'
+        self.assertIn('value', state.values())
+        self.dst.commit()
+        self.assertEqual(dict(state.items())['test'], 'value')
+        del state['test']
+        self.dst.commit()
+        self.assertNotIn('test', state)
+
+    def test_state_rollback(self):
+        """Test discarding of cached synchronization state on rollback"""
+        state = self.dst.state
+        state['test'] = 'committed'
+        self.dst.commit()
+        state['test'] = 'uncommitted'
+        state['other'] = 'uncommitted'
+        self.dst.session.rollback()
+        self.assertEqual(state['test'], 'committed')
+        self.assertNotIn('other', state)
+        self.dst.commit()
+        self.assertEqual(state['test'], 'committed')
+        with self.assertRaises(ValueError):
+            with self.dst.savepoint():
+                raise ValueError
+        state['test'] = 'retained'
+        with self.assertRaises(ValueError):
+            with self.dst.savepoint():
+                raise ValueError
+        self.dst.commit()
+        self.dst.session.rollback()
+        self.assertEqual(state['test'], 'retained')
+        state['test'] = 'discarded'
+        self.dst.rollback()
+        self.assertEqual(state['test'], 'retained')
+
+    def test_state_shared(self):
+        """Test synchronization state shared between connections"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'state.db')
+            with closing(sqlite3.connect(path)) as conn:
+                conn.executescript(self.schema)
+            first, second = (
+                SynchronizerTestCase.plugin_database(self,
+                                                     uri='sqlite:///' + path)
+                for _ in range(2)
+            )
+            first.prepare()
+            second.prepare()
+            self.assertIsNone(second.state.get('test'))
+            second.commit()
+
+            # Values committed via one connection are visible via another
+            first.state['test'] = 'value'
+            first.commit()
+            self.assertEqual(second.state.get('test'), 'value')
+            second.commit()
+
+            # Deletions committed via one connection are visible
+            del first.state['test']
+            first.commit()
+            self.assertIsNone(second.state.get('test'))
+            first.engine.dispose()
+            second.engine.dispose()
+
+    def test_prepare_uuid(self):
+        """Test migration of textual UUID columns"""
+        entries = self.ldap_sync('create-users.ldif')
+        alice = entries.users['alice'].syncid
+        bob = entries.users['bob'].syncid
+        model = self.dst.User.model
+        attr = getattr(model.orm, model.syncid)
+        desc = inspect(model.orm).all_orm_descriptors[model.syncid]
+        if desc.extension_type is ASSOCIATION_PROXY:
+            attr = attr.remote_attr
+        table = attr.parent.persist_selectable
+        column = table.columns[attr.name]
+
+        # Recreate synchronization identifier column as CHAR(36)
+        keys = [x.name for x in table.primary_key.columns]
+        rows = [dict(x) for x in self.dst.session.execute(
+            select([table.columns[x] for x in keys] + [column])
+        )]
+        for row in rows:
+            row[column.name] = ('invalid' if row[column.name] == alice
+                                else str(row[column.name]))
+        legacy = Table(table.name, MetaData(), *(
+            Column(x.name, x.type, primary_key=x.primary_key)
+            for x in table.columns if x is not column
+        ), Column(column.name, String(36), unique=column.unique,
+                  nullable=column.nullable))
+        self.dst.alembic.drop_table(table.name)
+        legacy.create(self.dst.session.connection())
+        self.dst.session.execute(insert(legacy), rows)
+        del self.dst.state[self.dst.state.KEY_SCHEMA]
+        self.dst.commit()
+        self.dst.session.expire_all()
+
+        # Migrate to binary storage
+        with patch.object(self.dst, 'MIGRATE_BATCH', 1):
+            self.dst.prepare()
+        columns = {x['name']: x['type'] for x in
+                   self.dst.inspector.get_columns(table.name)}
+        self.assertEqual(set(columns), {x.name for x in table.columns})
+        self.assertNotIsInstance(columns[column.name], String)
+        self.assertNotIn('_alembic_tmp_%s' % table.name,
+                         self.dst.inspector.get_table_names())
+        state = self.dst.state
+        self.assertEqual(state[state.KEY_SCHEMA], self.dst.fingerprint)
+        self.assertIsNotNone(self.dst.User.find_syncid(bob))
+        self.assertIsNone(self.dst.User.find_syncid(alice))
+
+        # Verify that resynchronization recovers the invalid identifier
+        entries = self.ldap_sync('create-users.ldif')
+        self.assertEqual(entries.users['alice'].syncid, alice)
+
+    def test_deadletter_database_error(self):
+        """Test that database errors not caused by an entry are raised"""
+        sync = UserSynchronizer.sync
+        for Error in (OperationalError, ProgrammingError):
+            with self.subTest(Error=Error):
+
+                def fail(syncer, src, dst, Error=Error):
+                    if src.key == 'bob':
+                        raise Error("UPDATE", {}, Exception("Failed"))
+                    sync(syncer, src, dst)
+
+                with patch.object(UserSynchronizer, 'sync', fail):
+                    with self.assertRaises(Error):
+                        self.ldap_sync('create-users.ldif')
+                self.dst.rollback()
+                self.assertEqual(self.dst.state.deadletters, {})
+
+    def test_sharded(self):
+        """Test synchronization with sharded destination writes"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'shard.db')
+            with closing(sqlite3.connect(path)) as conn:
+                conn.executescript(self.schema)
+            config = DatabaseConfig(self.plugin, {'uri': 'sqlite:///' + path})
+            syncer = ShardedSynchronizer(self.src, config, shards=2)
+            with self.ldap_patch('create-users.ldif'):
+                syncer.sync(persist=False)
+            self.assertEqual(syncer.pool.processes, [])
+            dst = config.database
+            entries = self.ldap_replay('create-users.ldif')
+            for key, value in (('alice', "Alice Archer"),
+                               ('bob', "Bob Baker")):
+                user = dst.User.find_match(entries.users[key])
+                self.assertAttribute(dst.User, user, 'displayName', value)
+            self.assertEqual(dst.state.cookie, syncer.syncer.dst.state.cookie)
+            self.assertIsNotNone(dst.state.cookie)
+            dst.engine.dispose()
+            syncer.syncer.dst.engine.dispose()
+
+    def test_sharded_deadletters(self):
+        """Test coordination of dead letters recorded by shard workers"""
+        entries = self.ldap_replay('create-users.ldif')
+        bob = entries.users['bob']
+        syncid = SyncId.from_uuid(bob.uuid)
+        config = MagicMock(database=self.dst, limits=None)
+        sharded = ShardedSynchronizer(self.src, config, shards=2)
+        sharded.pool = MagicMock()
+        coordinator = sharded.syncer
+        coordinator.start()
+        letter = coordinator.deadletters.DeadLetter(key=bob.key, user=True,
+                                                    retry=0)
+
+        # Dead letters reported by workers are visible to the coordinator
+        sharded.pool.receive.side_effect = [
+            ('deadletter', 0, syncid, str(letter)),
+            ('commit', 0, 1),
+            ('commit', 1, 1),
+        ]
+        sharded.barrier()
+        self.assertEqual(coordinator.deadletters, {syncid: letter})
+
+        # Failed entries are retried via the relevant shard worker
+        sharded.pool.send.reset_mock()
+        with patch.object(self.src, 'user', autospec=True,
+                          return_value=bob):
+            coordinator.retry()
+        request, = [x[0] for x in sharded.pool.send.call_args_list]
+        index, (op, snapshot, strict, commit) = request
+        self.assertEqual(index, sharded.shard(syncid))
+        self.assertEqual(op, 'entry')
+        self.assertIsInstance(snapshot, ShardUser)
+        self.assertEqual(snapshot.uuid, bob.uuid)
+        self.assertFalse(strict)
+        self.assertTrue(commit)
+        self.assertEqual(coordinator.deadletters[syncid].retry, math.inf)
+
+        # Recovery reported by workers clears the dead letter
+        sharded.pool.receive.side_effect = [
+            ('recovered', index, syncid),
+            ('commit', 0, 2),
+            ('commit', 1, 2),
+        ]
+        sharded.barrier()
+        self.assertEqual(coordinator.deadletters, {})
+
+        # Entries that are no longer present are abandoned by the worker
+        coordinator.deadletters[syncid] = letter
+        sharded.pool.send.reset_mock()
+        with patch.object(self.src, 'user', autospec=True,
+                          return_value=None):
+            coordinator.retry()
+        sharded.pool.send.assert_called_once_with(index, ('abandon', syncid))
+        self.assertEqual(coordinator.deadletters, {})
+
+    def test_shard_worker(self):
+        """Test synchronization within a shard worker"""
+        entries = self.ldap_replay('create-users.ldif')
+        bob = entries.users['bob']
+        syncid = SyncId.from_uuid(bob.uuid)
+        config = MagicMock(database=self.dst, limits=None)
+        schema = ShardedSynchronizer(self.src, config).schema
+        report = MagicMock()
+        syncer = ShardWorkerSynchronizer(ShardSource(schema), self.dst,
+                                         prepared=True, report=report)
+        syncer.start()
+        snapshot = ShardUser.snapshot(bob, schema['User'])
+        self.assertEqual(pickle.loads(pickle.dumps(snapshot)), snapshot)
+
+        # Failures are recorded and reported to the coordinator
+        with patch.object(syncer, 'entry', autospec=True,
+                          side_effect=ValueError("broken")):
+            self.assertTrue(syncer.request('entry', snapshot, False, True))
+        self.dst.commit()
+        self.assertIn(syncid, self.dst.state.deadletters)
+        report.assert_called_once_with('deadletter', syncid,
+                                       str(syncer.deadletters[syncid]))
+
+        # Recovery is reported to the coordinator
+        report.reset_mock()
+        self.assertFalse(syncer.request('entry', snapshot, False, False))
+        self.dst.commit()
+        report.assert_called_once_with('recovered', syncid)
+        self.assertEqual(self.dst.state.deadletters, {})
+        user = self.dst.User.find_syncid(syncid)
+        self.assertUserDisplayName(user, "Bob Baker")
+
+        # Requests are validated
+        self.assertTrue(syncer.request('commit', 1))
+        self.assertFalse(syncer.request('abandon', syncid))
+        with self.assertRaises(ValueError):
+            syncer.request('unknown')
@@ -1,7 +1,11 @@
 """Synchronization unit test common functionality"""
 
+import asyncio
+from unittest.mock import patch
+from ..base import DeletedSyncIds, RefreshComplete, SyncCookie
 from ..plugins import plugins
-from ..sync import synchronize
+from ..sync import (synchronize, async_synchronize, FanoutSynchronizer,
+                    Synchronizer, UserSynchronizer)
 from .replay import ReplayedEntries, ReplayTestCase
 
 
@@ -135,3 +139,189 @@ class SynchronizerTestCase(ReplayTestCase):
         self.assertUserSurname(entries.users['alice'], "Archer")
         self.assertUserUid(entries.users['bob'], "bob")
         self.assertUserEnabled(entries.users['alice'])
+
+    def test_enable_syncids(self):
+        """Test bulk enabling and disabling by synchronization identifier"""
+        entries = self.ldap_sync('create-users.ldif')
+        alice = entries.users['alice'].syncid
+        bob = entries.users['bob'].syncid
+        self.dst.enable_syncids([alice], enabled=False)
+        self.dst.commit()
+        self.assertUserDisabled(self.dst.User.find_syncid(alice))
+        self.assertUserEnabled(self.dst.User.find_syncid(bob))
+        self.dst.enable_syncids([alice], enabled=False, invert=True)
+        self.dst.enable_syncids([alice], enabled=True)
+        self.dst.commit()
+        self.assertUserEnabled(self.dst.User.find_syncid(alice))
+        self.assertUserDisabled(self.dst.User.find_syncid(bob))
+
+    def test_async(self):
+        """Test asynchronous synchronization"""
+        with self.ldap_patch('create-users.ldif'):
+            asyncio.run(async_synchronize(self.src, self.dst))
+        entries = self.ldap_replay('create-users.ldif')
+        alice = self.dst.User.find_match(entries.users['alice'])
+        self.assertUserCommonName(alice, "Alice Archer")
+        self.assertUserEnabled(alice)
+
+    def test_coalesce(self):
+        """Test coalescing of repeated modifications"""
+        with self.ldap_patch('modify-users.ldif'):
+            synchronize(self.src, self.dst, coalesce=0.01)
+        entries = self.ldap_replay('modify-users.ldif')
+        bob = self.dst.User.find_match(entries.users['bob'])
+        self.assertUserGivenName(bob, "Bobby")
+        self.assertIsNotNone(self.dst.state.cookie)
+
+    def test_batch(self):
+        """Test adaptive batching within configured bounds"""
+        syncer = Synchronizer(self.src, self.dst)
+        with self.ldap_patch('create-users.ldif'):
+            syncer.sync(batch={'target': 60, 'min_size': 1, 'max_size': 2})
+        self.assertEqual(syncer.batch.min_size, 1)
+        self.assertEqual(syncer.batch.max_size, 2)
+        metrics = syncer.metrics
+        self.assertEqual(metrics['pending'], 0)
+        self.assertEqual(metrics['deadletters'], 0)
+        self.assertGreater(metrics['batches'], 0)
+        self.assertLessEqual(metrics['size'], 2)
+        self.assertIsNotNone(self.dst.state.cookie)
+
+    def test_deadletter(self):
+        """Test isolation of entries that cannot be synchronized"""
+        sync = UserSynchronizer.sync
+
+        def fail(syncer, src, dst):
+            if src.key == 'bob':
+                raise ValueError("Unsynchronizable")
+            sync(syncer, src, dst)
+
+        with patch.object(UserSynchronizer, 'sync', fail):
+            entries = self.ldap_sync('create-users.ldif')
+        self.assertUserDisplayName(entries.users['alice'], "Alice Archer")
+        self.assertIsNone(entries.users['bob'])
+        self.assertIsNotNone(self.dst.state.cookie)
+        self.assertEqual(len(self.dst.state.deadletters), 1)
+
+    def test_deadletter_error(self):
+        """Test propagation of errors not attributable to an entry"""
+        sync = UserSynchronizer.sync
+
+        def fail(syncer, src, dst):
+            if src.key == 'bob':
+                raise TypeError("Broken")
+            sync(syncer, src, dst)
+
+        with patch.object(UserSynchronizer, 'sync', fail):
+            with self.assertRaises(TypeError):
+                self.ldap_sync('create-users.ldif')
+        self.assertEqual(self.dst.state.deadletters, {})
+
+    def test_priority(self):
+        """Test immediate commit of security-relevant changes"""
+        entries = self.ldap_replay('create-users.ldif')
+        alice = entries.users['alice']
+        bob = entries.users['bob']
+        disabled = patch.object(type(bob), 'enabled', False)
+        syncer = Synchronizer(self.src, self.dst)
+        with patch.object(self.dst, 'commit', autospec=True,
+                          side_effect=self.dst.commit) as commit:
+
+            # Disabled entries within a full refresh are not urgent
+            syncer.start()
+            with disabled:
+                syncer.apply(alice)
+                syncer.apply(bob)
+            commit.assert_not_called()
+            syncer.apply(RefreshComplete())
+            syncer.apply(SyncCookie('cookie'))
+            commit.reset_mock()
+
+            # Disabled entries and deletions are urgent when resuming
+            syncer.start()
+            syncer.apply(alice)
+            commit.assert_not_called()
+            with disabled:
+                syncer.apply(bob)
+            commit.assert_called_once_with()
+            commit.reset_mock()
+            syncer.apply(DeletedSyncIds([alice.uuid]))
+            commit.assert_called_once_with()
+
+    def test_priority_rollback(self):
+        """Test rollback of an interrupted refresh after an urgent commit"""
+        entries = self.ldap_sync('create-users.ldif')
+        cookie = self.dst.state.cookie
+        self.assertIsNotNone(cookie)
+        alice = entries.users['alice'].syncid
+        bob = entries.users['bob'].syncid
+        replayed = self.ldap_replay('create-users.ldif')
+        syncer = Synchronizer(self.src, self.dst)
+        syncer.start()
+        syncer.apply(replayed.users['alice'])
+        syncer.apply(DeletedSyncIds([bob]))
+        syncer.apply(SyncCookie('interrupted'))
+        self.dst.rollback()
+
+        # The urgent change is committed but the refresh is incomplete
+        self.assertUserDisabled(self.dst.User.find_syncid(bob))
+        self.assertUserEnabled(self.dst.User.find_syncid(alice))
+        self.assertEqual(self.dst.state.cookie, cookie)
+        self.assertEqual(syncer.cookie, SyncCookie('interrupted'))
+
+    def test_fanout(self):
+        """Test synchronization to multiple destinations"""
+        other = self.plugin_database()
+        with self.ldap_patch('create-users.ldif'):
+            FanoutSynchronizer(self.src, [self.dst, other]).sync()
+        entries = self.ldap_replay('create-users.ldif')
+        for dst in (self.dst, other):
+            bob = dst.User.find_match(entries.users['bob'])
+            self.assertAttribute(dst.User, bob, 'displayName', "Bob Baker")
+            self.assertEqual(dst.state.cookie, self.dst.state.cookie)
+        other.engine.dispose()
+
+    def test_fanout_cookies(self):
+        """Test synchronization to destinations with differing cookies"""
+        self.ldap_sync('create-users.ldif')
+        cookie = self.dst.state.cookie
+        self.assertIsNotNone(cookie)
+        other = self.plugin_database()
+        with self.ldap_patch('create-users.ldif'):
+            FanoutSynchronizer(self.src, [self.dst, other]).sync()
+            # pylint: disable=protected-access
+            cookies = sorted(str(x.kwargs['cookie']) for x in
+                             self.src._awatch_search.call_args_list)
+        self.assertEqual(cookies, sorted([str(cookie), str(None)]))
+        entries = self.ldap_replay('create-users.ldif')
+        for dst in (self.dst, other):
+            bob = dst.User.find_match(entries.users['bob'])
+            self.assertAttribute(dst.User, bob, 'displayName', "Bob Baker")
+        other.engine.dispose()
+
+    def test_fanout_lagging(self):
+        """Test synchronization to destinations that fall behind"""
+        other = self.plugin_database()
+        with patch.object(FanoutSynchronizer, 'maxsize', 1):
+            with self.ldap_patch('create-users.ldif'):
+                FanoutSynchronizer(self.src, [self.dst, other]).sync()
+        entries = self.ldap_replay('create-users.ldif')
+        for dst in (self.dst, other):
+            for key in ('alice', 'bob'):
+                self.assertIsNotNone(dst.User.find_match(entries.users[key]))
+            self.assertIsNotNone(dst.state.cookie)
+        other.engine.dispose()
+
+    def test_fanout_failure(self):
+        """Test synchronization with a failing destination"""
+        other = self.plugin_database()
+        fanout = FanoutSynchronizer(self.src, [self.dst, other])
+        with self.ldap_patch('create-users.ldif'), \
+             patch.object(fanout.syncers[1], 'apply', autospec=True,
+                          side_effect=ValueError("broken")):
+            with self.assertRaises(ValueError):
+                fanout.sync()
+        entries = self.ldap_replay('create-users.ldif')
+        bob = self.dst.User.find_match(entries.users['bob'])
+        self.assertUserDisplayName(bob, "Bob Baker")
+        other.engine.dispose()
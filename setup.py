@@ -26,6 +26,7 @@ setup(
         'console_scripts': [
             'idiosync=idiosync.cli:SynchronizeCommand.main',
             'idiotrace=idiosync.cli:TraceCommand.main',
+            'idiosyncd=idiosync.cli:DaemonCommand.main',
         ],
         'idiosync.plugins': [
             'ldap=idiosync.ldap:LdapDatabase',
@@ -63,3 +63,12 @@ CREATE TABLE `GroupMembers` (
   `LastUpdated` datetime DEFAULT NULL,
   UNIQUE (`GroupId`,`MemberId`)
 );
+
+CREATE TABLE `CachedGroupMembers` (
+  `id` INTEGER PRIMARY KEY NOT NULL,
+  `GroupId` int(11) DEFAULT NULL,
+  `MemberId` int(11) DEFAULT NULL,
+  `Via` int(11) DEFAULT NULL,
+  `ImmediateParentId` int(11) DEFAULT NULL,
+  `Disabled` smallint(6) NOT NULL DEFAULT 0
+);
@@ -0,0 +1,49 @@
+"""Base functionality tests"""
+
+import asyncio
+import threading
+import time
+import unittest
+from idiosync.base import aiterate
+
+
+class TestAiterate(unittest.TestCase):
+    """Asynchronous iteration tests"""
+
+    def test_cancel(self):
+        """Test cancellation while blocked within the iterable"""
+        release = threading.Event()
+        timer = threading.Timer(5, release.set)
+
+        def blocking():
+            yield 1
+            release.wait()
+            yield 2
+
+        async def consume():
+            return [x async for x in aiterate(blocking())]
+
+        async def cancel():
+            task = asyncio.create_task(consume())
+            await asyncio.sleep(0.1)
+            task.cancel()
+            start = time.monotonic()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return time.monotonic() - start
+
+        timer.start()
+        try:
+            elapsed = asyncio.run(cancel())
+        finally:
+            release.set()
+            timer.cancel()
+        self.assertLess(elapsed, 1)
+
+    def test_iterate(self):
+        """Test asynchronous iteration over a blocking iterable"""
+
+        async def consume():
+            return [x async for x in aiterate(range(5))]
+
+        self.assertEqual(asyncio.run(consume()), list(range(5)))
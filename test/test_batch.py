@@ -0,0 +1,45 @@
+"""Test adaptive batch sizing"""
+
+import unittest
+from idiosync.batch import BatchController, BatchMetrics
+
+
+class TestBatchController(unittest.TestCase):
+    """Test adaptive batch sizing"""
+
+    def test_grow(self):
+        """Test batch size growth while commits are fast"""
+        batch = BatchController(target=1, min_size=10, max_size=12)
+        batch.record(10, 0.1, 0.1)
+        self.assertEqual(batch.size, 11)
+        batch.record(11, 0.1, 0.1)
+        batch.record(12, 0.1, 0.1)
+        self.assertEqual(batch.size, 12)
+        self.assertEqual(batch.metrics.batches, 3)
+        self.assertEqual(batch.metrics.entries, 33)
+
+    def test_backoff(self):
+        """Test batch size reduction while commits are slow"""
+        batch = BatchController(target=1, min_size=10,
+                                metrics=BatchMetrics(size=100, interval=8))
+        batch.record(100, 0.1, 5)
+        self.assertEqual(batch.size, 50)
+        self.assertEqual(batch.interval, 4)
+        for _ in range(10):
+            batch.record(50, 0.1, 5)
+        self.assertEqual(batch.size, 10)
+        self.assertEqual(batch.interval, 1)
+
+    def test_due(self):
+        """Test batch completion"""
+        batch = BatchController(min_size=10, min_interval=60)
+        self.assertFalse(batch.due(9, float('inf')))
+        self.assertTrue(batch.due(10, float('inf')))
+        self.assertTrue(batch.due(1, float('-inf')))
+
+    def test_bounds(self):
+        """Test validation of bounds"""
+        with self.assertRaises(ValueError):
+            BatchController(min_size=10, max_size=5)
+        with self.assertRaises(ValueError):
+            BatchController(min_interval=0)
@@ -0,0 +1,155 @@
+"""Synchronization daemon tests"""
+
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+from idiosync.config import ConfigError, DaemonConfig
+from idiosync.daemon import Daemon, DaemonJob
+
+
+class TestDaemonConfig(unittest.TestCase):
+    """Synchronization daemon configuration tests"""
+
+    source = {'plugin': 'ipa', 'uri': 'ldap://ipa.example.com'}
+
+    @staticmethod
+    def destination(name):
+        """Construct destination database configuration"""
+        return {'plugin': 'mediawiki', 'url': 'sqlite:///%s.db' % name}
+
+    def config(self, **kwargs):
+        """Construct daemon configuration"""
+        return {
+            'jobs': {
+                'wiki': {
+                    'source': self.source,
+                    'destination': self.destination('wiki'),
+                },
+                'docs': {
+                    'source': self.source,
+                    'destination': self.destination('docs'),
+                    'strict': True,
+                },
+                'tickets': {
+                    'source': self.source,
+                    'destination': self.destination('tickets'),
+                    'interval': 300,
+                    'delete': True,
+                },
+            },
+            **kwargs,
+        }
+
+    def test_parse(self):
+        """Test parsing configuration"""
+        config = DaemonConfig.parse(self.config(concurrency=2, retry=5))
+        self.assertEqual(config.concurrency, 2)
+        self.assertEqual(config.retry, 5)
+        self.assertEqual(set(config.jobs), {'wiki', 'docs', 'tickets'})
+        wiki = config.jobs['wiki']
+        self.assertTrue(wiki.persist)
+        self.assertIsNone(wiki.interval)
+        self.assertFalse(wiki.strict)
+        self.assertFalse(wiki.delete)
+        self.assertTrue(config.jobs['docs'].strict)
+        tickets = config.jobs['tickets']
+        self.assertFalse(tickets.persist)
+        self.assertEqual(tickets.interval, 300)
+        self.assertTrue(tickets.delete)
+
+    def test_invalid(self):
+        """Test parsing invalid configuration"""
+        with self.assertRaises(ConfigError):
+            DaemonConfig.parse({})
+        with self.assertRaises(ConfigError):
+            DaemonConfig.parse(self.config(concurrency=0))
+        with self.assertRaises(ConfigError):
+            DaemonConfig.parse(self.config(retry=True))
+        for key, value in (('interval', -1), ('interval', 'hourly'),
+                           ('strict', 'yes')):
+            config = self.config()
+            config['jobs']['wiki'][key] = value
+            with self.assertRaises(ConfigError):
+                DaemonConfig.parse(config)
+
+    def test_jobs(self):
+        """Test grouping of configured jobs"""
+        daemon = DaemonConfig.parse(self.config()).daemon
+        self.assertIsInstance(daemon, Daemon)
+        self.assertEqual(len(daemon.jobs), 2)
+        persist, periodic = daemon.jobs
+        self.assertEqual(persist.names, ['wiki', 'docs'])
+        self.assertTrue(persist.persist)
+        self.assertEqual(len(persist.dsts), 2)
+        self.assertEqual(persist.options, [
+            {'strict': False, 'delete': False},
+            {'strict': True, 'delete': False},
+        ])
+        self.assertEqual(str(persist), 'wiki,docs')
+        self.assertEqual(periodic.names, ['tickets'])
+        self.assertFalse(periodic.persist)
+        self.assertEqual(periodic.interval, 300)
+        self.assertEqual(periodic.options, [{'strict': False,
+                                             'delete': True}])
+
+
+class TestDaemonJob(unittest.TestCase):
+    """Synchronization daemon job tests"""
+
+    def job(self):
+        """Construct daemon job with mock databases"""
+        job = DaemonJob(['test'], MagicMock(), [MagicMock(), MagicMock()],
+                        options=[{'strict': False, 'delete': False}] * 2)
+        FanoutSynchronizer = patch.object(job, 'FanoutSynchronizer').start()
+        self.addCleanup(patch.stopall)
+        return job, FanoutSynchronizer.return_value
+
+    def test_run(self):
+        """Test successful run"""
+        job, syncer = self.job()
+        syncer.async_sync.return_value = asyncio.sleep(0)
+        asyncio.run(job.run())
+        syncer.async_sync.assert_called_once_with(persist=True)
+        syncer.close.assert_called_once_with()
+        databases = job.databases
+        self.assertEqual(databases, [x.database for x in job.dsts])
+        for db in databases:
+            db.rollback.assert_not_called()
+
+    def test_failure(self):
+        """Test rollback of destination databases after a failed run"""
+        job, syncer = self.job()
+        syncer.async_sync.side_effect = ValueError("broken")
+        with self.assertRaises(ValueError):
+            asyncio.run(job.run())
+        syncer.close.assert_called_once_with()
+        self.assertIsNotNone(job.databases)
+        for db in job.databases:
+            db.rollback.assert_called_once_with()
+
+    def test_rollback_failure(self):
+        """Test discarding of destination databases after a failed rollback"""
+        job, syncer = self.job()
+        syncer.async_sync.side_effect = ValueError("broken")
+        for dst in job.dsts:
+            dst.database.rollback.side_effect = ValueError("disconnected")
+        with self.assertRaises(ValueError):
+            asyncio.run(job.run())
+        self.assertIsNone(job.databases)
+
+
+class TestDaemon(unittest.TestCase):
+    """Synchronization daemon tests"""
+
+    def test_persist(self):
+        """Test restarting failed refresh and persist job"""
+        config = MagicMock(jobs={}, retry=5)
+        daemon = Daemon(config)
+        job = MagicMock(spec=DaemonJob)
+        job.run.side_effect = ValueError("broken")
+        with patch.object(asyncio, 'sleep', autospec=True,
+                          side_effect=[None, asyncio.CancelledError]) as sleep:
+            with self.assertRaises(asyncio.CancelledError):
+                asyncio.run(daemon.persist(job))
+        self.assertEqual(job.run.call_count, 2)
+        sleep.assert_called_with(5)
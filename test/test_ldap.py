@@ -0,0 +1,282 @@
+"""LDAP user database tests"""
+
+import asyncio
+import socket
+from unittest.mock import ANY, MagicMock, patch
+import ldap
+from ldap.controls import SimplePagedResultsControl
+from ldap.syncrepl import SyncDoneControl
+from idiosync.base import RefreshComplete, SyncCookie
+from idiosync.freeipa import IpaDatabase
+from idiosync.test import ReplayTestCase
+
+
+class TestScope(ReplayTestCase):
+    """Search base and scope tests"""
+
+    # pylint: disable=protected-access
+
+    base = 'dc=example,dc=org'
+    users = 'cn=users,cn=accounts,dc=example,dc=org'
+    groups = 'cn=groups,cn=accounts,dc=example,dc=org'
+
+    def scoped_database(self, **kwargs):
+        """Construct LDAP database with configured search bases"""
+        with patch.object(ldap, 'initialize', autospec=True):
+            return IpaDatabase(base=self.base, **kwargs)
+
+    def test_within(self):
+        """Test checking distinguished names against base and scope"""
+        bob = 'uid=bob,%s' % self.users
+        nested = 'uid=carol,ou=staff,%s' % self.users
+        admins = 'cn=admins,%s' % self.groups
+        for scope, expected in (('base', {self.users}),
+                                ('one', {bob}),
+                                ('sub', {self.users, bob, nested})):
+            db = self.scoped_database(users={'base': self.users,
+                                             'scope': scope})
+            model = db.User.model
+            self.assertEqual({x for x in (self.users, bob, nested, admins)
+                              if model.within(x)}, expected)
+            self.assertEqual(model.within(bob.upper()), bob in expected)
+        with self.assertRaises(ValueError):
+            self.scoped_database(users={'scope': 'everything'})
+        with self.assertRaises(ValueError):
+            self.scoped_database(users={'base': self.users, 'size': 10})
+
+    def test_watch_base(self):
+        """Test watch search base and scope"""
+        db = self.scoped_database()
+        self.assertTrue(db._watch_exact)
+        self.assertEqual(db._watch_base, (self.base, 'sub'))
+        db = self.scoped_database(users={'base': self.users},
+                                  groups={'base': self.groups})
+        self.assertFalse(db._watch_exact)
+        self.assertEqual(db._watch_base,
+                         ('cn=accounts,dc=example,dc=org', 'sub'))
+        db = self.scoped_database(users={'base': self.users, 'scope': 'one'},
+                                  groups={'base': self.users})
+        self.assertFalse(db._watch_exact)
+        self.assertEqual(db._watch_base, (self.users, 'sub'))
+
+    def test_out_of_scope(self):
+        """Test discarding of watched entries outside base and scope"""
+        db = self.scoped_database(
+            users={'base': 'cn=staff,%s' % self.users},
+            groups={'base': self.groups},
+        )
+        with patch.object(db, '_watch_search', autospec=True,
+                          return_value=self.ldap_watch_search(
+                              'create-users.ldif'
+                          )):
+            events = list(db.watch(persist=False))
+        self.assertEqual([x for x in events if isinstance(x, db.User)], [])
+        groups = {x.key for x in events if isinstance(x, db.Group)}
+        self.assertIn('ipausers', groups)
+        self.assertTrue(all(db.Group.model.within(x.dn) for x in events
+                            if isinstance(x, db.Group)))
+
+
+class TestBootstrap(ReplayTestCase):
+    """Partitioned bootstrap refresh tests"""
+
+    # pylint: disable=protected-access
+
+    partitions = [
+        {'base': 'cn=users,cn=accounts,dc=example,dc=org'},
+        {'base': 'cn=groups,cn=accounts,dc=example,dc=org'},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.results = list(self.ldap_watch_search('create-users.ldif'))
+        self.entries = {}
+        for res in self.results:
+            if res.type == ldap.RES_SEARCH_ENTRY:
+                for dn, attrs, _ctrls in res.data:
+                    self.entries[dn] = attrs
+        self.searches = []
+
+    def connection(self, *_args, **_kwargs):
+        """Construct mock partition search connection
+
+        Each partition returns its entries one per page.
+        """
+        conn = MagicMock()
+        pages = []
+
+        def search_ext(base, _scope, _search, _attrs, serverctrls):
+            paged, = serverctrls
+            self.searches.append((base, paged.cookie))
+            if not paged.cookie:
+                pages.extend([(dn, attrs)] for dn, attrs in
+                             self.entries.items() if dn.endswith(base))
+            return len(self.searches)
+
+        def result3(msgid):
+            page = pages.pop(0)
+            cookie = b'page%d' % msgid if pages else b''
+            ctrl = SimplePagedResultsControl(cookie=cookie)
+            return ldap.RES_SEARCH_RESULT, page, msgid, [ctrl]
+
+        conn.search_ext.side_effect = search_ext
+        conn.result3.side_effect = result3
+        return conn
+
+    def bootstrap_database(self):
+        """Construct LDAP database with configured partitions"""
+        patch.object(ldap, 'initialize', autospec=True,
+                     side_effect=self.connection).start()
+        self.addCleanup(patch.stopall)
+        return IpaDatabase(partitions=self.partitions)
+
+    def test_bootstrap(self):
+        """Test partitioned bootstrap refresh"""
+        db = self.bootstrap_database()
+        with patch.object(db, '_watch_search_ext', autospec=True,
+                          return_value=42) as search, \
+             patch.object(db, '_bootstrap_cookie', autospec=True,
+                          return_value='cookie') as cookie:
+            events = list(db.watch(persist=False))
+        search.assert_called_once_with(persist=False, attrs=['1.1'],
+                                       conn=ANY)
+        self.assertEqual(cookie.call_args[0][0], 42)
+        *entries, complete, final = events
+        self.assertEqual({x.dn for x in entries}, set(self.entries))
+        self.assertEqual({x.key for x in entries if isinstance(x, db.User)},
+                         {'alice', 'bob'})
+        self.assertIsInstance(complete, RefreshComplete)
+        self.assertTrue(complete.autodelete)
+        self.assertEqual(final, SyncCookie('cookie'))
+        self.assertEqual(len(self.searches), len(self.entries))
+        for base, paged in self.searches:
+            self.assertTrue(any(base == x['base'] for x in self.partitions))
+            self.assertTrue(not paged or paged.startswith(b'page'))
+
+    def test_bootstrap_failure(self):
+        """Test partitioned bootstrap refresh with a failing partition"""
+        db = self.bootstrap_database()
+        with patch.object(db, '_bootstrap_search', autospec=True,
+                          side_effect=ldap.SIZELIMIT_EXCEEDED), \
+             patch.object(db, '_watch_search_ext', autospec=True), \
+             patch.object(db, '_bootstrap_cookie', autospec=True):
+            with self.assertRaises(ldap.SIZELIMIT_EXCEEDED):
+                list(db.watch(persist=False))
+
+    def test_bootstrap_cookie(self):
+        """Test obtaining bootstrap synchronization cookie"""
+        db = self.bootstrap_database()
+        intermediate = next(x for x in self.results
+                            if x.type == ldap.RES_INTERMEDIATE)
+        done = SyncDoneControl()
+        done.cookie = 'cookie'
+        done.refreshDeletes = False
+        results = [
+            ldap.TIMEOUT(),
+            (intermediate.type, intermediate.data, 1, intermediate.ctrls,
+             intermediate.name, intermediate.value),
+            (ldap.RES_SEARCH_RESULT, [], 1, [done], None, None),
+        ]
+        stop = MagicMock()
+        stop.is_set.return_value = False
+        with patch.object(db, '_watch_result4', autospec=True,
+                          side_effect=results):
+            cookie = db._bootstrap_cookie(1, stop)
+        self.assertEqual(cookie, 'cookie')
+
+    def test_bootstrap_cookie_abandon(self):
+        """Test abandoning bootstrap synchronization cookie search"""
+        db = self.bootstrap_database()
+        stop = MagicMock()
+        stop.is_set.return_value = True
+        with patch.object(db, '_watch_result4', autospec=True,
+                          side_effect=ldap.TIMEOUT):
+            self.assertIsNone(db._bootstrap_cookie(1, stop))
+        db.ldap.abandon.assert_called_once_with(1)
+
+
+class TestAsyncWatch(ReplayTestCase):
+    """Asynchronous watch tests"""
+
+    # pylint: disable=protected-access
+
+    def setUp(self):
+        super().setUp()
+        self.results = list(self.ldap_watch_search('create-users.ldif'))
+        self.writers = []
+        self.connections = []
+
+    def connection(self, *_args, **_kwargs):
+        """Construct mock watch connection
+
+        Each connection has a real file descriptor, which becomes
+        readable as each result is made available.
+        """
+        reader, writer = socket.socketpair()
+        reader.setblocking(False)
+        self.addCleanup(reader.close)
+        self.addCleanup(writer.close)
+        self.writers.append(writer)
+        results = list(self.results)
+        conn = MagicMock()
+        conn.fileno.return_value = reader.fileno()
+
+        def result4(_msgid, timeout=-1, **_kwargs):
+            try:
+                reader.recv(1)
+            except BlockingIOError:
+                if timeout:
+                    raise
+                return (None,) * 6
+            res = results.pop(0)
+            return (res.type, res.data, res.msgid, res.ctrls, res.name,
+                    res.value)
+
+        conn.result4.side_effect = result4
+        self.connections.append(conn)
+        return conn
+
+    async def release(self):
+        """Make results available on all connections, one at a time"""
+        for _res in self.results:
+            await asyncio.sleep(0.01)
+            for writer in self.writers:
+                writer.send(b'x')
+
+    @staticmethod
+    async def collect(db, count):
+        """Collect events from an asynchronous watch"""
+        events = []
+        watch = db.awatch()
+        try:
+            async for event in watch:
+                events.append(event)
+                if len(events) == count:
+                    break
+        finally:
+            await watch.aclose()
+        return events
+
+    def test_concurrent(self):
+        """Test concurrent asynchronous watches of the same database"""
+        with patch.object(ldap, 'initialize', autospec=True,
+                          side_effect=self.connection):
+            db = IpaDatabase()
+            count = sum(len(list(db._watch_result(x))) for x in self.results)
+
+            async def watch():
+                watches = asyncio.gather(self.collect(db, count),
+                                         self.collect(db, count))
+                await asyncio.sleep(0.01)
+                await self.release()
+                return await asyncio.wait_for(watches, timeout=5)
+
+            first, second = asyncio.run(watch())
+        self.assertEqual(len(self.connections), 3)
+        self.assertEqual([repr(x) for x in first],
+                         [repr(x) for x in second])
+        self.assertEqual({x.key for x in first if isinstance(x, db.User)},
+                         {'alice', 'bob'})
+        _bound, *watches = self.connections
+        for conn in watches:
+            conn.unbind_s.assert_called_once_with()
@@ -0,0 +1,48 @@
+"""Test destination database rate limiting"""
+
+import pickle
+import time
+import unittest
+from idiosync.limit import RateLimits, TokenBucket
+
+
+class TestRateLimits(unittest.TestCase):
+    """Test destination database rate limiting"""
+
+    def test_bucket(self):
+        """Test token bucket rate limiting"""
+        bucket = TokenBucket(rate=100, burst=5)
+        start = time.monotonic()
+        for _ in range(15):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_unlimited(self):
+        """Test absence of limits"""
+        limits = RateLimits()
+        start = time.monotonic()
+        for _ in range(1000):
+            limits.write()
+            limits.commit()
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_update(self):
+        """Test changing limits in place"""
+        limits = RateLimits(writes=10)
+        limits.update(RateLimits(commits=5, burst=2))
+        self.assertEqual(limits, RateLimits(commits=5, burst=2))
+        self.assertIsNone(limits.buckets['writes'].rate)
+        self.assertEqual(limits.buckets['commits'].rate, 5)
+        self.assertEqual(limits.buckets['commits'].burst, 2)
+
+    def test_pickle(self):
+        """Test pickling (for use by worker processes)"""
+        limits = RateLimits(writes=10, commits=2)
+        self.assertEqual(pickle.loads(pickle.dumps(limits)), limits)
+
+    def test_invalid(self):
+        """Test validation of limits"""
+        with self.assertRaises(ValueError):
+            RateLimits(writes=0)
+        with self.assertRaises(ValueError):
+            RateLimits(commits='fast')
@@ -1,9 +1,58 @@
 """Test MediaWiki database"""
 
 import idiosync.test
+from idiosync.mediawiki import OrmIpBlock, OrmUserGroup
 
 
 class MediaWikiTestCase(idiosync.test.SqlTestCase):
     """MediaWiki database tests"""
 
     plugin = 'mediawiki'
+
+    def test_legacy_block(self):
+        """Test migration of blocks recorded with the external user name"""
+        entries = self.ldap_sync('create-users.ldif')
+        alice = entries.users['alice']
+        syncid = alice.syncid
+        self.dst.session.add(OrmIpBlock(ipb_address='alice',
+                                        ipb_user=alice.row.user_id))
+        state = self.dst.state
+        del state[state.KEY_SCHEMA]
+        self.dst.commit()
+        self.dst.prepare()
+        blocks = self.dst.query(OrmIpBlock).all()
+        self.assertEqual([x.ipb_address for x in blocks], ['Alice'])
+        self.assertUserDisabled(self.dst.User.find_syncid(syncid))
+
+        # Disabling does not duplicate the migrated block
+        self.dst.enable_syncids([syncid], enabled=False)
+        self.dst.commit()
+        self.assertEqual(self.dst.query(OrmIpBlock).count(), 1)
+
+        # Enabling removes the migrated block
+        self.dst.enable_syncids([syncid], enabled=True)
+        self.dst.commit()
+        self.assertEqual(self.dst.query(OrmIpBlock).count(), 0)
+        self.assertUserEnabled(self.dst.User.find_syncid(syncid))
+
+    def test_groups(self):
+        """Test listing groups from the membership index"""
+        entries = self.ldap_sync('create-users.ldif')
+        alice = entries.users['alice']
+        bob = entries.users['bob']
+        self.dst.session.add_all([
+            OrmUserGroup(ug_user=alice.row.user_id, ug_group='staff'),
+            OrmUserGroup(ug_user=bob.row.user_id, ug_group='staff'),
+            OrmUserGroup(ug_user=bob.row.user_id, ug_group='admins'),
+            OrmUserGroup(ug_user=9999, ug_group='orphans'),
+        ])
+        self.dst.commit()
+        groups = {x.key: {y.key for y in x.users} for x in self.dst.groups}
+        self.assertEqual(groups, {
+            'staff': {'Alice', 'Bob'},
+            'admins': {'Bob'},
+            'orphans': set(),
+        })
+        for key, users in groups.items():
+            self.assertEqual({x.key for x in self.dst.Group(key).users},
+                             users)
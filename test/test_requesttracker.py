@@ -1,9 +1,101 @@
 """Test Request Tracker database"""
 
+import uuid
+from sqlalchemy import event
 import idiosync.test
+from idiosync.requesttracker import (OrmCachedMember, OrmMember, OrmPrincipal,
+                                     Principals)
 
 
 class RequestTrackerTestCase(idiosync.test.SqlTestCase):
     """Request Tracker database tests"""
 
     plugin = 'requesttracker'
+
+    def cached_members(self, group):
+        """Get cached group membership member IDs and disabled status"""
+        query = self.dst.query(OrmCachedMember).filter(
+            OrmCachedMember.GroupId == group.row.id
+        )
+        return {x.MemberId: x.Disabled for x in query}
+
+    def test_cached_members(self):
+        """Test cached group membership maintenance"""
+        users = []
+        for uid in ('alice', 'bob'):
+            user = self.dst.User.create()
+            user.uid = uid
+            users.append(user)
+        group = self.dst.Group.create()
+        group.commonName = 'staff'
+        self.dst.commit()
+        self.assertEqual(self.cached_members(group), {group.row.id: 0})
+        for user in users:
+            group.row.memberships.append(OrmMember(user=user.row))
+        self.dst.commit()
+        self.assertEqual(self.cached_members(group), {
+            group.row.id: 0, users[0].row.id: 0, users[1].row.id: 0,
+        })
+        group.enabled = False
+        self.dst.commit()
+        self.assertEqual(set(self.cached_members(group).values()), {1})
+        group.enabled = True
+        group.row.memberships.remove(next(
+            x for x in group.row.memberships if x.user is users[0].row
+        ))
+        self.dst.commit()
+        self.assertEqual(self.cached_members(group), {
+            group.row.id: 0, users[1].row.id: 0,
+        })
+
+    def test_allocate(self):
+        """Test principal identifier block allocation"""
+        existing = self.dst.User.create()
+        existing.uid = 'alice'
+        self.dst.commit()
+        ids = Principals.allocate(self.dst.session, 5)
+        self.assertEqual(len(set(ids)), 5)
+        self.assertTrue(all(x > existing.row.id for x in ids))
+        self.assertEqual(
+            {x.id for x in self.dst.query(OrmPrincipal)}, {existing.row.id}
+        )
+        users = []
+        for uid in ('bob', 'carol', 'dave'):
+            user = self.dst.User.create()
+            user.uid = uid
+            users.append(user)
+        self.dst.commit()
+        self.assertEqual(len({x.row.id for x in users}), 3)
+        self.assertEqual(
+            {x.id: x.PrincipalType for x in self.dst.query(OrmPrincipal)},
+            {x.row.id: 'User' for x in [existing] + users},
+        )
+
+    def test_members(self):
+        """Test group membership projection and listing"""
+        syncid = uuid.uuid4()
+        users = []
+        for uid in ('alice', 'bob', 'carol'):
+            user = self.dst.User.create()
+            user.uid = uid
+            users.append(user)
+        users[1].syncid = syncid
+        group = self.dst.Group.create()
+        group.commonName = 'staff'
+        for user in users[:2]:
+            group.row.memberships.append(OrmMember(user=user.row))
+        self.dst.commit()
+        self.assertEqual(set(group.members), {
+            (users[0].row.id, None), (users[1].row.id, syncid),
+        })
+        self.assertEqual({x.key for x in group.users}, {'alice', 'bob'})
+        self.assertEqual({x.key for x in users[0].groups}, {'staff'})
+        self.dst.session.expire_all()
+        statements = []
+        event.listen(self.dst.engine, 'before_cursor_execute',
+                     lambda *args: statements.append(args[2]))
+        listed = {x.key: (x.enabled, x.syncid) for x in self.dst.users}
+        self.assertEqual(listed, {'alice': (True, None), 'bob': (True, syncid),
+                                  'carol': (True, None)})
+        self.assertEqual(len(statements), 3)
+        self.assertFalse(any('JOIN' in x for x in statements))
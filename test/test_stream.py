@@ -0,0 +1,51 @@
+"""Event stream tests"""
+
+import unittest
+from uuid import uuid4
+from idiosync.base import DeletedSyncIds, RefreshComplete, SyncCookie, SyncId
+from idiosync.shard import ShardUser
+from idiosync.stream import coalesce
+
+
+class TestCoalesce(unittest.TestCase):
+    """Event coalescing tests"""
+
+    @staticmethod
+    def user(key, uuid=None):
+        """Construct user entry"""
+        if uuid is None:
+            uuid = SyncId.from_uuid(uuid4())
+        return ShardUser(key=key, uuid=uuid)
+
+    @staticmethod
+    def summary(events):
+        """Summarise events for comparison"""
+        return [('delete', list(x)) if isinstance(x, DeletedSyncIds) else x
+                for x in events]
+
+    def test_coalesce(self):
+        """Test coalescing repeated modifications"""
+        alice = self.user('alice')
+        bob = self.user('bob')
+        renamed = self.user('bobby', uuid=bob.uuid)
+        complete = RefreshComplete()
+        cookie = SyncCookie('cookie')
+        events = list(coalesce([alice, bob, cookie, renamed, complete],
+                               latency=60))
+        self.assertEqual(events, [alice, renamed, cookie, complete])
+
+    def test_order(self):
+        """Test preserving relative order of deletions and modifications"""
+        old = self.user('bob')
+        new = self.user('bob')
+        alice = self.user('alice')
+        carol = self.user('carol')
+        events = list(coalesce([
+            old, DeletedSyncIds([old.uuid]), alice, new,
+            DeletedSyncIds([alice.uuid]), DeletedSyncIds([carol.uuid]),
+        ], latency=60))
+        self.assertEqual(self.summary(events), [
+            ('delete', [old.uuid]),
+            new,
+            ('delete', [alice.uuid, carol.uuid]),
+        ])
@@ -0,0 +1,43 @@
+"""Test synchronization identifiers"""
+
+import unittest
+from uuid import UUID
+from idiosync.base import SyncId
+
+
+class TestSyncId(unittest.TestCase):
+    """Test synchronization identifiers"""
+
+    uuid = UUID('6ba7b810-9dad-11d1-80b4-00c04fd430c8')
+
+    def test_from_bytes(self):
+        """Test construction from raw value"""
+        self.assertEqual(SyncId.from_bytes(self.uuid.bytes), self.uuid)
+        with self.assertRaises(ValueError):
+            SyncId.from_bytes(b'\x00')
+
+    def test_from_str(self):
+        """Test parsing from canonical and nsUniqueId representations"""
+        self.assertEqual(SyncId.from_str(str(self.uuid)), self.uuid)
+        self.assertEqual(SyncId.from_str(str(self.uuid).encode()), self.uuid)
+        nsuniqueid = '6ba7b810-9dad11d1-80b400c0-4fd430c8'
+        self.assertEqual(SyncId.from_str(nsuniqueid), self.uuid)
+        self.assertEqual(SyncId.from_str('{%s}' % self.uuid), self.uuid)
+        with self.assertRaises(ValueError):
+            SyncId.from_str('not-a-uuid')
+
+    def test_from_uuid(self):
+        """Test construction from UUID"""
+        syncid = SyncId.from_uuid(self.uuid)
+        self.assertIsInstance(syncid, SyncId)
+        self.assertEqual(syncid, self.uuid)
+        self.assertEqual(hash(syncid), hash(self.uuid))
+        self.assertIs(SyncId.from_uuid(syncid), syncid)
+        self.assertEqual(SyncId(uuid=self.uuid), self.uuid)
+
+    def test_nsuniqueid(self):
+        """Test nsUniqueId representation"""
+        syncid = SyncId.from_uuid(self.uuid)
+        self.assertEqual(syncid.nsuniqueid,
+                         '6ba7b810-9dad11d1-80b400c0-4fd430c8')
+        self.assertEqual(str(syncid), str(self.uuid))